@@ -0,0 +1,121 @@
+###########################################################
+#######           CONTROL SYSTEMS SIMULATOR         #######
+#######              BATCH RUNNER                   #######
+###########################################################
+
+# Command line runner for scenario files, without tkinter. A scenario file is
+# a JSON list of scenarios, or an object with optional "defaults" shared by
+# every scenario and a "scenarios" list. A scenario holds the arguments of
+# Simulation.simulate (numP, denP, L, padeOrder, mode, signal, magnitude,
+# timeIn, simTime, points, ...) and either the controller polynomials (numC,
+# denC) or a PID given as controllerType ('Standard', 'Parallel' or 'Series')
+# and kp, ki, kd and alpha. An optional "name" identifies it in the outputs.
+#
+#    python Batch.py scenarios.json --workers 32 --metrics metrics.csv --series out/
+#
+# Without --metrics, one JSON line per scenario is printed with its indexes.
+# The exit status is 1 if any scenario failed.
+
+# Libraries.
+import argparse
+import functools
+import json
+import os
+import sys
+import Simulation as sim
+import Export
+from Pool import SimulationPool
+
+# Scenario keys that are not arguments of Simulation.simulate.
+scenarioKeys = ('name','controllerType','kp','ki','kd','alpha')
+
+def loadScenarios(path):
+   # Reads a scenario file and applies its defaults.
+   # Returns: list of scenario dictionaries, each with a name.
+   with open(path) as file:
+      data = json.load(file)
+   if isinstance(data,list):
+      data = {'scenarios': data}
+   defaults = data.get('defaults',{})
+   scenarios = []
+   for i,scenario in enumerate(data['scenarios']):
+      scenario = dict(defaults,**scenario)
+      scenario.setdefault('name','scenario{}'.format(i))
+      scenarios.append(scenario)
+   return scenarios
+
+def simulateArguments(scenario):
+   # Returns: keyword arguments of Simulation.simulate for a scenario.
+   case = {k: v for k,v in scenario.items() if k not in scenarioKeys}
+   if 'controllerType' in scenario and case.get('mode') != 'process':
+      case['numC'],case['denC'] = sim.controllerPolynomials(scenario['controllerType'],scenario['kp'],
+                                                           scenario['ki'],scenario['kd'],scenario['alpha'])
+   return case
+
+def runScenario(scenario,series=True):
+   # Simulates one scenario in a worker process. Failing scenarios are
+   # reported instead of stopping the batch. Without series only the indexes
+   # and Ms are returned, so the time series are not sent back to the caller.
+   # Returns: (results,parameters,error): error is None or the error message.
+   try:
+      case = simulateArguments(scenario)
+      results = sim.simulate(**case)
+   except Exception as error:
+      return None,scenario,'{}: {}'.format(type(error).__name__,error)
+   if not series:
+      results = {'indexes': results['indexes'],'Ms': results['Ms']}
+   return results,dict(case),None
+
+def runScenarios(scenarios,workers=None,progress=None,series=True):
+   # Runs the scenarios in a pool of worker processes (in this process if
+   # workers is 1), see runScenario for series.
+   # Returns: list of runScenario results, in the order of scenarios.
+   run = functools.partial(runScenario,series=series)
+   if workers == 1:
+      results = []
+      for i,scenario in enumerate(scenarios):
+         results.append(run(scenario))
+         if progress is not None:
+            progress(i+1,len(scenarios))
+      return results
+   with SimulationPool(workers) as pool:
+      return pool.map(run,scenarios,progress=progress)
+
+def main(argv=None):
+   parser = argparse.ArgumentParser(description='Runs the simulations of a scenario file.')
+   parser.add_argument('scenarios',help='JSON scenario file')
+   parser.add_argument('--workers',type=int,default=None,help='worker processes (default: one per core)')
+   parser.add_argument('--metrics',help='CSV file for the parameters and indexes of every scenario')
+   parser.add_argument('--series',help='directory for the time series of every scenario')
+   parser.add_argument('--format',choices=('npz','csv'),default='npz',help='time series file format')
+   parser.add_argument('--quiet',action='store_true',help='do not report progress on stderr')
+   args = parser.parse_args(argv)
+
+   scenarios = loadScenarios(args.scenarios)
+   progress = None
+   if not args.quiet:
+      progress = lambda done,total: print('{}/{} scenarios'.format(done,total),file=sys.stderr)
+   runs = runScenarios(scenarios,args.workers,progress,series=args.series is not None)
+
+   failed = 0
+   for scenario,(results,parameters,error) in zip(scenarios,runs):
+      if error is not None:
+         failed += 1
+         print('{}: {}'.format(scenario['name'],error),file=sys.stderr)
+   done = [(results,dict(name=scenario['name'],**parameters)) for scenario,(results,parameters,error) in zip(scenarios,runs)
+           if error is None]
+   if args.metrics:
+      Export.saveIndexesCsv(args.metrics,done)
+   else:
+      for results,parameters in done:
+         print(json.dumps(Export.metadata(results,parameters)))
+   if args.series:
+      os.makedirs(args.series,exist_ok=True)
+      for results,parameters in done:
+         path = os.path.join(args.series,'{}.{}'.format(parameters['name'],args.format))
+         if args.format == 'csv': Export.saveCsv(path,results,parameters)
+         else: Export.saveNpz(path,results,parameters)
+   return 1 if failed else 0
+
+if __name__ == '__main__':
+   sys.exit(main())
@@ -0,0 +1,256 @@
+###########################################################
+#######           CONTROL SYSTEMS SIMULATOR         #######
+#######              BENCHMARKS                     #######
+###########################################################
+
+# Timing and memory benchmarks of the simulation and plotting hot paths:
+# closed loop construction, Pade approximations of several orders, responses,
+# performance indexes, complete simulations of every control mode, plot
+# redraws and realtime slider updates, over representative plants. Caches are
+# cleared before every repetition so the cold paths are measured. The startup
+# benchmark runs the code Interface.py executes before creating its window
+# in a new interpreter and fails if they pull in a heavy library;
+# test_startup.py enforces the startup budget on the same measurement.
+#
+#    python Benchmark.py                        # report
+#    python Benchmark.py --save baseline.json   # store a baseline
+#    python Benchmark.py --compare baseline.json --tolerance 1.5
+#
+# Timings depend on the machine, so a baseline is only meaningful on the
+# machine that saved it and is not kept in the repository. With --compare
+# the exit status is 1 if any benchmark is slower than the baseline by more
+# than the tolerance factor; benchmarks missing from the baseline are
+# reported, so save a new one after adding benchmarks.
+
+# Libraries.
+import argparse
+import ast
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+import control as co
+import Simulation as sim
+import Signals
+import Discrete
+from Plotting import PlotPanel
+
+# Representative plants: name, numerator, denominator and dead time.
+plants = (
+   ('first order',[1.],[1.,1.],0.5),
+   ('second order',*sim.processPolynomials('Standard',1.,1.,0.7),1.),
+   ('Alt. two-pole',*sim.processPolynomials('Alt.',1.,2.,0.5),1.),
+   ('long dead time',[1.],[4.,4.,1.],8.),
+)
+
+# Controller of the closed loop benchmarks.
+controller = sim.controllerPolynomials('Standard',1.,2.,0.3,0.1)
+
+# Heavy modules the imports done before the window must not pull in and the
+# time budget (s) of those imports.
+heavyModules = ('control','scipy','matplotlib','PIL','Simulation')
+startupBudget = 1.
+directory = os.path.dirname(os.path.abspath(__file__))
+interface = os.path.join(directory,'Interface.py')
+
+def clearCaches():
+   sim.resultCache.clear()
+   sim.unitResponses.clear()
+   sim.pades.clear()
+   sim.phaseLimits.clear()
+   Signals.signals.clear()
+   Discrete.discretizations.clear()
+
+def measure(fn,repeat=5,cold=True):
+   # Times fn() repeat times (clearing the caches first if cold) and measures
+   # the peak memory allocated by one call.
+   # Returns: dictionary with the minimum and median time (s) and the peak memory (bytes).
+   times = []
+   for i in range(repeat):
+      if cold: clearCaches()
+      start = time.perf_counter()
+      fn()
+      times.append(time.perf_counter()-start)
+   if cold: clearCaches()
+   tracemalloc.start()
+   fn()
+   peak = tracemalloc.get_traced_memory()[1]
+   tracemalloc.stop()
+   return {'min': min(times),'median': float(np.median(times)),'memory': peak}
+
+def simulationBenchmarks(quick=False):
+   # Returns: list of (name,function,repeat,cold) benchmarks of the simulation core.
+   benchmarks = []
+   repeat = 2 if quick else 5
+   modes = ('process','servo','reg','both')
+   for name,numP,denP,L in plants:
+      P = sim.process(numP,denP,L,10)
+      C = co.tf(*controller)
+      benchmarks.append(('closed loop/{}'.format(name),lambda C=C,P=P: sim.closedLoop(C,P),repeat*4,True))
+      sys,experiments,Ms = sim.modeModel(numP,denP,L,10,'both',*controller)
+      t = np.linspace(0,50,5001)
+      benchmarks.append(('response/{}'.format(name),lambda sys=sys,t=t: sim.response(sys,1.,1.,t,'step'),repeat,True))
+      for mode in modes if not quick else ('servo',):
+         benchmarks.append(('simulate {}/{}'.format(mode,name),
+                            lambda numP=numP,denP=denP,L=L,mode=mode:
+                               sim.simulate(numP,denP,L,10,mode,'step',1.,1.,50,*controller),repeat,True))
+      benchmarks.append(('simulate delay/{}'.format(name),
+                         lambda numP=numP,denP=denP,L=L: sim.simulate(numP,denP,L,10,'servo','step',1.,1.,50,*controller,
+                                                                      engine='delay'),repeat,True))
+      benchmarks.append(('simulate auto pade/{}'.format(name),
+                         lambda numP=numP,denP=denP,L=L: sim.simulate(numP,denP,L,'auto','servo','step',1.,1.,50,*controller),
+                         repeat,True))
+   for order in (1,3,5,10,15,20):
+      benchmarks.append(('pade/order {}'.format(order),lambda order=order: co.pade(2.,n=order),repeat*4,True))
+      benchmarks.append(('process/pade {}'.format(order),lambda order=order: sim.process([1.],[1.,3.,2.],2.,order),repeat*4,True))
+   results = sim.simulate([1.],[1.,3.,2.],1.,10,'both','step',1.,1.,50,*controller)
+   benchmarks.append(('indexes/5001 samples',lambda: sim.performanceIndexes('MYR',results['input'],results['MYR'],results['t'],results['UR']),repeat*4,False))
+   return benchmarks
+
+def realtimeBenchmarks(quick=False):
+   # A realtime slider update: new controller polynomials and a simulation
+   # with the realtime engine, every update being a cache miss.
+   # Returns: list of (name,function,repeat,cold) benchmarks.
+   kp = [1.]
+   def update():
+      kp[0] += 0.1
+      numC,denC = sim.controllerPolynomials('Standard',kp[0],2.,0.3,0.1)
+      sim.simulate([1.],[1.,1.4,1.],1.,10,'servo','step',1.,1.,50,numC,denC,engine='discrete')
+   return [('realtime/slider update',update,5 if quick else 20,False)]
+
+def plotBenchmarks(quick=False):
+   # Plot updates on an offscreen canvas: a full redraw (new limits) and a
+   # blitted update (same limits, new data).
+   # Returns: list of (name,function,repeat,cold) benchmarks.
+   figure = Figure(figsize=(5,4),dpi=100)
+   canvas = FigureCanvasAgg(figure)
+   ax = figure.add_subplot(111)
+   panel = PlotPanel(canvas,ax,None)
+   panel.visible = True  # No Tk widget to show.
+   results = sim.simulate([1.],[1.,3.,2.],1.,10,'servo','step',1.,1.,50,*controller)
+   t,u,y = results['t'],results['input'],results['MYR']
+   scale = [1.]
+   def full():
+      scale[0] = 3.-scale[0]  # Alternates between 1 and 2, changing the limits.
+      panel.update(t,u,scale[0]*y,'r(t)','y(t)','System Response','s')
+   def blit():
+      scale[0] = 1.001 if scale[0] != 1.001 else 1.
+      panel.update(t,u,scale[0]*y,'r(t)','y(t)','System Response','s')
+   repeat = 5 if quick else 20
+   return [('graph/full redraw',full,repeat,False),('graph/blit update',blit,repeat,False)]
+
+def launch(args):
+   # Runs Python with args in the repository directory.
+   # Returns: the completed process.
+   return subprocess.run([sys.executable]+list(args),cwd=directory,capture_output=True,text=True,timeout=120)
+
+def startupCode(path=interface):
+   # The code the GUI script path runs before its window: the module level
+   # statements (imports, lazy modules, ...) that precede the first one
+   # calling Tk().
+   # Returns: list of statements, as source code.
+   statements = []
+   with open(path) as file:
+      tree = ast.parse(file.read())
+   for node in tree.body:
+      if any(isinstance(n,ast.Call) and getattr(n.func,'attr',getattr(n.func,'id',None)) == 'Tk' for n in ast.walk(node)):
+         break
+      statements.append(ast.unparse(node))
+   return statements
+
+def startupImports(path=interface):
+   # Runs the code of the GUI script path before its window (see startupCode)
+   # in a new interpreter, timing that code only (not the interpreter launch).
+   # Returns: (seconds,heavy): the run time and the heavy modules loaded.
+   code = ('import sys as benchmarkSys,time as benchmarkTime\nbenchmarkStart = benchmarkTime.perf_counter()\n{}\n'
+           'print(benchmarkTime.perf_counter()-benchmarkStart,*[m for m in {!r} if m in benchmarkSys.modules])').format(
+              '\n'.join(startupCode(path)),heavyModules)
+   process = launch(['-c',code])
+   if process.returncode != 0:
+      raise RuntimeError(process.stderr)
+   seconds,*heavy = process.stdout.split()
+   return float(seconds),heavy
+
+def startupCheck():
+   # Returns: None; raises RuntimeError if a heavy module is loaded before the window.
+   seconds,heavy = startupImports()
+   if heavy:
+      raise RuntimeError('modules loaded before the window: {}'.format(','.join(heavy)))
+
+def startupBenchmarks(quick=False):
+   # Returns: list of (name,function,repeat,cold) benchmarks.
+   return [('startup/imports',startupCheck,2 if quick else 5,False)]
+
+def run(quick=False,select=None):
+   # Runs every benchmark whose name contains select (all if None).
+   # Returns: dictionary of measurements keyed by benchmark name.
+   report = {}
+   groups = (simulationBenchmarks,realtimeBenchmarks,plotBenchmarks)
+   if select is None or 'startup/'.startswith(select) or select.startswith('startup/'):
+      # Only when selected, since they launch interpreters.
+      groups += (startupBenchmarks,)
+   for name,fn,repeat,cold in sum((group(quick) for group in groups),[]):
+      if select is None or select in name:
+         report[name] = measure(fn,repeat,cold)
+   return report
+
+def compare(report,baseline,tolerance):
+   # Returns: list of (name,ratio) of the benchmarks slower than the baseline
+   #          by more than the tolerance factor.
+   slower = []
+   for name,values in report.items():
+      if name in baseline['benchmarks']:
+         ratio = values['median']/max(baseline['benchmarks'][name]['median'],1e-9)
+         if ratio > tolerance:
+            slower.append((name,ratio))
+   return slower
+
+def missing(report,baseline):
+   # Returns: names of the benchmarks of report that are not in the baseline.
+   return [name for name in report if name not in baseline['benchmarks']]
+
+def main(argv=None):
+   parser = argparse.ArgumentParser(description='Benchmarks the simulation and plotting hot paths.')
+   parser.add_argument('--save',help='write the results as a baseline JSON file')
+   parser.add_argument('--compare',help='baseline JSON file to compare against')
+   parser.add_argument('--tolerance',type=float,default=1.5,help='allowed slowdown factor (default 1.5)')
+   parser.add_argument('--select',help='only run benchmarks whose name contains this text')
+   parser.add_argument('--quick',action='store_true',help='fewer repetitions and modes')
+   args = parser.parse_args(argv)
+
+   report = run(args.quick,args.select)
+   baseline = None
+   if args.compare:
+      with open(args.compare) as file:
+         baseline = json.load(file)
+   print('{:<40} {:>11} {:>11} {:>11} {:>8}'.format('benchmark','min (ms)','median (ms)','memory (kB)','ratio'))
+   for name,values in report.items():
+      ratio = ''
+      if baseline is not None and name in baseline['benchmarks']:
+         ratio = '{:.2f}'.format(values['median']/max(baseline['benchmarks'][name]['median'],1e-9))
+      print('{:<40} {:>11.3f} {:>11.3f} {:>11.1f} {:>8}'.format(name,values['min']*1e3,values['median']*1e3,
+                                                              values['memory']/1024,ratio))
+   if args.save:
+      with open(args.save,'w') as file:
+         json.dump({'python': platform.python_version(),'machine': platform.machine(),
+                    'numpy': np.__version__,'control': co.__version__,'benchmarks': report},file,indent=1)
+   status = 0
+   if baseline is not None:
+      slower = compare(report,baseline,args.tolerance)
+      for name,ratio in slower:
+         print('REGRESSION: {} is {:.2f} times slower than the baseline'.format(name,ratio),file=sys.stderr)
+      for name in missing(report,baseline):
+         print('MISSING: {} is not in the baseline, save a new one to compare it'.format(name),file=sys.stderr)
+      if slower: status = 1
+   return status
+
+if __name__ == '__main__':
+   sys.exit(main())
@@ -0,0 +1,84 @@
+###########################################################
+#######           CONTROL SYSTEMS SIMULATOR         #######
+#######              RESULT CACHES                  #######
+###########################################################
+
+# Bounded least recently used cache shared by the simulation core. Entries are
+# evicted when either the number of entries or the estimated memory used by the
+# cached values exceeds its limit. Caches are used from the GUI thread and the
+# background simulation worker, so every operation holds a lock.
+
+# Libraries.
+from collections import OrderedDict
+import sys
+import threading
+import numpy as np
+
+def sizeOf(value):
+   # Estimates the memory used by a cached value, following dictionaries,
+   # lists and tuples and counting the buffers of numpy arrays.
+   # Returns: size in bytes.
+   if isinstance(value,np.ndarray):
+      return value.nbytes
+   if isinstance(value,dict):
+      return sys.getsizeof(value) + sum(sizeOf(k)+sizeOf(v) for k,v in value.items())
+   if isinstance(value,(list,tuple)):
+      return sys.getsizeof(value) + sum(sizeOf(v) for v in value)
+   return sys.getsizeof(value)
+
+class LRUCache:
+   # Least recently used cache with entry and memory limits and hit/miss counters.
+
+   def __init__(self,maxEntries=128,maxBytes=64*2**20):
+      self.maxEntries = maxEntries
+      self.maxBytes = maxBytes
+      self.entries = OrderedDict()  # key: (value,size)
+      self.bytes = 0
+      self.hits = 0
+      self.misses = 0
+      self.lock = threading.Lock()
+
+   def __len__(self):
+      return len(self.entries)
+
+   def __contains__(self,key):
+      return key in self.entries
+
+   def get(self,key,default=None):
+      # Returns: cached value (marked as most recently used) or default.
+      with self.lock:
+         if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key][0]
+         self.misses += 1
+         return default
+
+   def put(self,key,value):
+      # Stores value and evicts the least recently used entries over the limits.
+      # Values larger than the whole memory limit are not stored.
+      # Returns: value.
+      size = sizeOf(value)
+      with self.lock:
+         if key in self.entries:
+            self.bytes -= self.entries.pop(key)[1]
+         if size > self.maxBytes:
+            return value
+         self.entries[key] = (value,size)
+         self.bytes += size
+         while len(self.entries) > self.maxEntries or self.bytes > self.maxBytes:
+            k,(v,s) = self.entries.popitem(last=False)
+            self.bytes -= s
+      return value
+
+   def clear(self):
+      with self.lock:
+         self.entries.clear()
+         self.bytes = 0
+         self.hits = 0
+         self.misses = 0
+
+   def stats(self):
+      # Returns: dictionary with the hits, misses, entries and bytes used.
+      with self.lock:
+         return {'hits': self.hits,'misses': self.misses,'entries': len(self.entries),'bytes': self.bytes}
@@ -0,0 +1,213 @@
+###########################################################
+#######           CONTROL SYSTEMS SIMULATOR         #######
+#######              DEAD TIME ENGINE               #######
+###########################################################
+
+# Exact dead time simulation, without Pade approximations. An open loop
+# response to an input delayed by L is the undelayed response shifted by L,
+# which is a pure shift of whole samples when L is a multiple of the sample
+# time (and a linear interpolation between samples otherwise).
+#
+# In a loop, the dead time sits between the controller output plus the
+# disturbance, w = u+d, and the process input v(t) = w(t-L). The loop is
+# integrated on the uniform time grid with the exact discretization engine
+# (Discrete.simulateFrom), the rational process A(s) and the controller C(s)
+# being simulated separately. Past values of w are kept in a circular buffer
+# (DelayLine) spanning the dead time. Since v over the next L only depends on
+# w already computed, the process and the controller are each advanced one
+# block of L at a time with vectorized calls instead of one Python step per
+# sample. Dead times of only a few samples would make the blocks too short,
+# so they are integrated one step at a time with the discretized matrices;
+# below one sample the loop equations of every step are solved for the
+# process input. The states never include the 10+ extra states of a high
+# order Pade approximation, so the loop is not stiff. The delay itself is
+# exact; the signals passed between the process and the controller are taken
+# as linear between samples, which is second order accurate in the sample time.
+
+# Libraries.
+import numpy as np
+import Discrete
+
+# Shortest dead time, in samples, integrated in blocks instead of step by step.
+blockSamples = 16
+
+class DelayLine:
+   # Circular buffer with the last samples of a signal, initially at rest.
+
+   def __init__(self,size):
+      self.buffer = np.zeros(size)
+      self.start = 0  # Index of the oldest sample.
+
+   def push(self,values):
+      # Appends values, dropping as many of the oldest samples.
+      values = np.asarray(values,dtype=float)[-len(self.buffer):]
+      index = (self.start+np.arange(len(values))) % len(self.buffer)
+      self.buffer[index] = values
+      self.start = (self.start+len(values)) % len(self.buffer)
+
+   def append(self,value):
+      # Appends one value, dropping the oldest sample.
+      self.buffer[self.start] = value
+      self.start = (self.start+1) % len(self.buffer)
+
+   def at(self,k):
+      # Returns: the k-th oldest sample (0 for the oldest).
+      return self.buffer[(self.start+k) % len(self.buffer)]
+
+   def values(self):
+      # Returns: the buffered samples, oldest first.
+      return np.roll(self.buffer,-self.start)
+
+def split(L,h):
+   # Splits the dead time in whole samples and a fraction of a sample.
+   # Returns: (m,f) with L = (m+f)*h and 0 <= f < 1.
+   m = int(np.floor(L/h+1e-9))
+   f = max(L/h-m,0.)
+   if f < 1e-9: f = 0.
+   return m,f
+
+def shift(y,time,L):
+   # Delays responses on a uniform time grid by L, from rest.
+   # Returns: the delayed responses, with the shape of y.
+   y = np.asarray(y,dtype=float)
+   ntp = len(time)
+   if L <= 0 or ntp < 2:
+      return y.copy()
+   m,f = split(L,time[1]-time[0])
+   rows = np.atleast_2d(y)
+   delayed = np.zeros_like(rows)
+   if m < ntp:
+      delayed[:,m:] = rows[:,:ntp-m]
+   if f > 0 and m+1 < ntp:
+      # Linear interpolation between the samples around t-L.
+      delayed[:,m+1:] = (1-f)*delayed[:,m+1:]+f*rows[:,:ntp-m-1]
+      delayed[:,m] = (1-f)*delayed[:,m]
+   return delayed.reshape(y.shape)
+
+def simulateLoop(plant,controller,time,r,d,L):
+   # Simulates e = r-y, u = C*e, y = A*v with v(t) = u(t-L)+d(t-L) from rest on
+   # a uniform time grid, plant and controller being single input state space
+   # models of A(s) and C(s), with v linear between samples as in Discrete.py.
+   # Returns: (y,u), the process output and the controller output.
+   time = np.asarray(time,dtype=float)
+   r = np.asarray(r,dtype=float);d = np.asarray(d,dtype=float)
+   ntp = len(time)
+   if ntp < 2:
+      y = np.zeros(ntp)  # At rest, v = 0 until t = L.
+      return y,controller.D[0,0]*(r-y)
+   h = time[1]-time[0]
+   m,f = split(L,h)
+   if m >= blockSamples:
+      return blockLoop(plant,controller,time,r,d,h,m,f)
+   return stepLoop(plant,controller,time,r,d,h,m,f)
+
+def blockLoop(plant,controller,time,r,d,h,m,f):
+   # simulateLoop for L = (m+f)*h, advancing one block of m samples at a time.
+   # Returns: (y,u).
+   ntp = len(time)
+   line = DelayLine(m+2)  # w[n-m-1] ... w[n] at the start of a block.
+   line.append(controller.D[0,0]*r[0]+d[0])  # w[0], with y[0] = 0 at rest.
+   y = np.empty(ntp);u = np.empty(ntp)
+   za = zc = None
+   start = 0
+   while True:
+      # Block of samples start...stop: v needs w up to stop-m <= start, known.
+      stop = min(start+m,ntp-1)
+      history = line.values()
+      v = (1-f)*history[1:]+f*history[:-1]
+      v = v[:stop-start+1]
+      t = time[start:stop+1]
+      ya,za = Discrete.simulateFrom(plant,t,v,za,h)
+      e = r[start:stop+1]-ya[0]
+      uc,zc = Discrete.simulateFrom(controller,t,e,zc,h)
+      y[start:stop+1] = ya[0];u[start:stop+1] = uc[0]
+      line.push(uc[0][1:]+d[start+1:stop+1])
+      if stop == ntp-1:
+         return y,u
+      start = stop
+
+def stepper(sys,h):
+   # Returns: (Ad,G0,G1,C,D) of the first order hold discretization of a
+   #          single input single output model, x[n+1] = Ad*x[n] +
+   #          G0*u[n] + G1*(u[n+1]-u[n]), y[n] = C*x[n] + D*u[n].
+   n = sys.A.shape[0]
+   if n == 0:
+      return np.zeros((0,0)),np.zeros(0),np.zeros(0),np.zeros(0),sys.D[0,0]
+   z = Discrete.discretize(sys,h)
+   Ad = (z['Q']@z['T']@z['Q'].conj().T).real
+   return Ad,z['G0'][:,0],z['G1'][:,0],sys.C[0],sys.D[0,0]
+
+def stepLoop(plant,controller,time,r,d,h,m,f):
+   # simulateLoop for L = (m+f)*h, one sample at a time. For m = 0, v[n+1]
+   # depends on w[n+1] and so on y[n+1] and is solved from the loop equations
+   # x[n+1] = p+a1*v[n+1], y[n+1] = yp+gy*v[n+1], u[n+1] = uq+gu*e[n+1].
+   # Returns: (y,u).
+   ntp = len(time)
+   Aa,a0,a1,ca,da = stepper(plant,h)
+   Ac,c0,c1,cc,dc = stepper(controller,h)
+   gy = ca@a1+da;gu = cc@c1+dc
+   if m == 0 and 1+(1-f)*gu*gy == 0:
+      raise ValueError('Ill-posed loop: 1+C(inf)*P(inf) = 0.')
+   x = np.zeros(len(a0));xc = np.zeros(len(c0))
+   line = DelayLine(m+1)  # w[n-m] ... w[n] after sample n.
+   y = np.empty(ntp);u = np.empty(ntp)
+   v = 0.;e = r[0]
+   y[0] = 0.;u[0] = dc*e  # At rest, v = 0 until t = L.
+   line.append(u[0]+d[0])
+   for n in range(ntp-1):
+      p = Aa@x+(a0-a1)*v
+      q = Ac@xc+(c0-c1)*e
+      if m > 0:
+         vNext = (1-f)*line.at(1)+f*line.at(0)
+      else:
+         yp = ca@p;uq = cc@q
+         vNext = ((1-f)*(uq+gu*(r[n+1]-yp)+d[n+1])+f*line.at(0))/(1+(1-f)*gu*gy)
+      x = p+a1*vNext
+      y[n+1] = ca@x+da*vNext
+      eNext = r[n+1]-y[n+1]
+      xc = q+c1*eNext
+      u[n+1] = cc@xc+dc*eNext
+      line.append(u[n+1]+d[n+1])
+      v,e = vNext,eNext
+   return y,u
+
+def frequencies(polynomials,L,perDecade=500):
+   # Logarithmic frequency grid two decades beyond the corner frequencies of
+   # the polynomials (their nonzero roots) and of the dead time.
+   # Returns: frequency array (rad/time unit).
+   corners = [1/L] if L > 0 else []
+   for p in polynomials:
+      roots = np.roots(np.trim_zeros(np.asarray(p,dtype=float),'f'))
+      corners += [abs(x) for x in roots if abs(x) > 1e-12]
+   if not corners:
+      corners = [1.]
+   lo = np.floor(np.log10(min(corners)))-2
+   hi = np.ceil(np.log10(max(corners)))+2
+   return np.logspace(lo,hi,int((hi-lo)*perDecade)+1)
+
+def loopResponse(numP,denP,L,numC,denC,w):
+   # Returns: C(jw)*A(jw)*e^(-jwL), the loop frequency response.
+   s = 1j*w
+   return np.polyval(numC,s)*np.polyval(numP,s)*np.exp(-s*L)/(np.polyval(denC,s)*np.polyval(denP,s))
+
+def maxSensitivity(numP,denP,L,numC,denC):
+   # Maximum sensitivity of the loop with the exact dead time, the peak of
+   # 1/|1+C(jw)*A(jw)*e^(-jwL)| over a dense frequency grid.
+   # Returns: Ms.
+   w = frequencies((numP,denP,numC,denC),L)
+   return float(np.max(1/np.abs(1+loopResponse(numP,denP,L,numC,denC,w))))
+
+def bandwidth(numP,denP,L,numC=None,denC=None):
+   # Bandwidth of the closed loop C*P/(1+C*P) with the exact dead time (of the
+   # process alone without controller): the highest frequency of the grid
+   # where the magnitude is still within 3 dB of its low frequency value.
+   # Returns: bandwidth (rad/time unit).
+   if numC is None:
+      w = frequencies((numP,denP),L)
+      magnitude = np.abs(np.polyval(numP,1j*w)/np.polyval(denP,1j*w))
+   else:
+      w = frequencies((numP,denP,numC,denC),L)
+      loop = loopResponse(numP,denP,L,numC,denC,w)
+      magnitude = np.abs(loop/(1+loop))
+   within = np.nonzero(magnitude >= magnitude[0]/np.sqrt(2))[0]
+   return float(w[within[-1]])
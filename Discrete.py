@@ -0,0 +1,81 @@
+###########################################################
+#######           CONTROL SYSTEMS SIMULATOR         #######
+#######              DISCRETE SIMULATION ENGINE     #######
+###########################################################
+
+# Fixed-step simulation engine, an alternative to co.forced_response for
+# uniform time grids. The continuous model is discretized exactly with matrix
+# exponentials for an input that is linear between samples (first order hold),
+# which is the input assumed by co.forced_response, so both engines agree to
+# rounding error: the outputs match within 1e-9 relative to the output range
+# for well conditioned loops (see Simulation.response). A zero order hold
+# discretization is also available, it differs from co.forced_response by
+# O(h) around input discontinuities.
+#
+# The recursion x[n+1] = Ad*x[n] + v[n] runs in the complex Schur basis of Ad,
+# where it is triangular: every state is a first order IIR filter driven by the
+# input and the states already computed, so it is evaluated with one
+# scipy.signal.lfilter call (a C loop) per state instead of a Python loop per
+# time sample. The unitary change of basis keeps this numerically stable.
+
+# Libraries.
+import numpy as np
+from scipy.linalg import expm, schur
+from scipy.signal import lfilter
+from Cache import LRUCache
+
+# Discretized models, keyed by model, sample time and hold.
+discretizations = LRUCache(maxEntries=64)
+
+def discretize(sys,h,hold='foh'):
+   # Discretizes a single input state space model with sample time h.
+   # Returns: dictionary with the Schur factors T, Q of Ad, the input matrices
+   #          G0 (u[n]) and G1 (u[n+1]-u[n], zero for 'zoh'), CQ = C*Q and D.
+   key = (sys.A.tobytes(),sys.B.tobytes(),sys.C.tobytes(),sys.D.tobytes(),sys.A.shape,sys.C.shape,float(h),hold)
+   d = discretizations.get(key)
+   if d is not None:
+      return d
+   n = sys.A.shape[0];m = sys.B.shape[1]
+   M = np.zeros((n+2*m,n+2*m))
+   M[:n,:n] = sys.A*h
+   M[:n,n:n+m] = sys.B*h
+   M[n:n+m,n+m:] = np.eye(m)
+   E = expm(M)
+   Ad = E[:n,:n]
+   G0 = E[:n,n:n+m]
+   G1 = E[:n,n+m:] if hold == 'foh' else np.zeros((n,m))
+   T,Q = schur(Ad,output='complex')
+   d = {'T': T,'Q': Q,'G0': G0,'G1': G1,'CQ': sys.C@Q,'D': sys.D}
+   return discretizations.put(key,d)
+
+def simulate(sys,time,u,hold='foh'):
+   # Simulates a single input model from rest on a uniform time grid.
+   # Returns: y with one row per output.
+   return simulateFrom(sys,time,u,hold=hold)[0]
+
+def simulateFrom(sys,time,u,z0=None,h=None,hold='foh'):
+   # Simulates a single input model on a uniform time grid of sample time h
+   # (time[1]-time[0] by default) from the state z0 at time[0], given in the
+   # Schur basis of discretize(sys,h) (None for rest). Consecutive chunks of a
+   # long simulation are simulated by passing the returned state as z0 of the
+   # chunk starting on the last sample, with the same h.
+   # Returns: (y,z): y with one row per output and z, the state at time[-1].
+   ntp = len(time)
+   u = np.asarray(u,dtype=float)
+   if sys.A.shape[0] == 0 or (ntp < 2 and (z0 is None or h is None)):
+      return np.outer(sys.D[:,0],u),z0
+   d = discretize(sys,time[1]-time[0] if h is None else h,hold)
+   T = d['T']
+   if z0 is None:
+      z0 = np.zeros(T.shape[0],dtype=complex)
+   # Input term of every step, in the Schur basis: w[n] drives z[n+1].
+   QH = d['Q'].conj().T
+   w = np.zeros((T.shape[0],ntp),dtype=complex)
+   w[:,:-1] = np.outer(QH@(d['G0']-d['G1'])[:,0],u[:-1]) + np.outer(QH@d['G1'][:,0],u[1:])
+   z = np.empty_like(w)
+   for i in range(T.shape[0]-1,-1,-1):
+      # z_i[n+1] = T_ii*z_i[n] + w_i[n], z_i[0] = z0_i.
+      z[i] = lfilter([0.,1.],[1.,-T[i,i]],w[i],zi=z0[i:i+1])[0]
+      if i > 0:
+         w[:i] += np.outer(T[:i,i],z[i])
+   return (d['CQ']@z).real + np.outer(d['D'][:,0],u),z[:,-1].copy()
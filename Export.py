@@ -0,0 +1,155 @@
+###########################################################
+#######           CONTROL SYSTEMS SIMULATOR         #######
+#######              RESULTS EXPORT                 #######
+###########################################################
+
+# Export of simulation results (as returned by Simulation.simulate or
+# Streaming.simulate) to compressed numpy archives and CSV files. Every file
+# carries the simulation parameters and the performance indexes as JSON
+# metadata. CSV rows are formatted a block at a time with a single string
+# operation and written through a large buffer, so exporting long series or
+# thousands of runs is limited by the disk rather than by Python. Results of
+# Streaming.simulate only keep a decimated view in memory; their full series
+# are read from the memory-mapped .npy file the simulation wrote.
+
+# Libraries.
+import inspect
+import json
+import numpy as np
+import Simulation as sim
+
+# Rows formatted per write and size of the file buffers.
+blockRows = 65536
+bufferSize = 1 << 20
+
+# Order of the series columns.
+seriesNames = ('t','input','P','MYR','UR','MYD','UD')
+
+def simulateParameters(*args,**kwargs):
+   # Names the arguments of a Simulation.simulate call.
+   # Returns: dictionary of parameter values, defaults included.
+   bound = inspect.signature(sim.simulate).bind(*args,**kwargs)
+   bound.apply_defaults()
+   parameters = dict(bound.arguments)
+   parameters.update(parameters.pop('signalParams',{}))
+   return parameters
+
+def plain(value):
+   # Converts numpy values and containers to JSON serializable values.
+   # Returns: converted value.
+   if isinstance(value,dict):
+      return {str(k): plain(v) for k,v in value.items()}
+   if isinstance(value,(list,tuple,np.ndarray)):
+      return [plain(v) for v in value]
+   if isinstance(value,np.generic):
+      return value.item()
+   return value
+
+def metadata(results,parameters=None):
+   # Returns: dictionary with the parameters, indexes and Ms of a run.
+   return plain({'parameters': parameters or {},'indexes': results.get('indexes',{}),'Ms': results.get('Ms')})
+
+def columns(results):
+   # Returns: names of the series present in results, in export order.
+   return [name for name in seriesNames if name in results]
+
+def fullSeries(results):
+   # The complete series of a run: the memory-mapped rows of the .npy file
+   # of a Streaming.simulate result, the series of results otherwise.
+   # Returns: dictionary of series keyed by name.
+   if 'path' not in results:
+      return results
+   table = np.load(results['path'],mmap_mode='r')
+   return dict(zip(results['rows'],table))
+
+def saveNpz(path,results,parameters=None,compressed=True):
+   # Writes the series of one run and its metadata (JSON string) to a numpy archive.
+   # Returns: None
+   series = fullSeries(results)
+   arrays = {name: np.asarray(series[name]) for name in columns(results)}
+   arrays['metadata'] = np.array(json.dumps(metadata(results,parameters)))
+   (np.savez_compressed if compressed else np.savez)(path,**arrays)
+
+def saveBatchNpz(path,runs,compressed=True):
+   # Writes many runs, given as (results,parameters) pairs, to one numpy
+   # archive. Series of runs with the same columns and number of samples are
+   # stored column-oriented as (runs,samples) arrays; otherwise every run gets
+   # its own 'run<i>/<column>' arrays. 'metadata' holds a JSON list with the
+   # metadata of every run.
+   # Returns: None
+   runs = list(runs)
+   arrays = {}
+   layouts = {(tuple(columns(r)),len(r['t'])) for r,p in runs}
+   if len(layouts) == 1:
+      for name in columns(runs[0][0]):
+         arrays[name] = np.stack([np.asarray(r[name]) for r,p in runs])
+   else:
+      for i,(r,p) in enumerate(runs):
+         for name in columns(r):
+            arrays['run{}/{}'.format(i,name)] = np.asarray(r[name])
+   arrays['metadata'] = np.array(json.dumps([metadata(r,p) for r,p in runs]))
+   (np.savez_compressed if compressed else np.savez)(path,**arrays)
+
+def writeRows(file,table,prefix=''):
+   # Writes the rows of a 2D table as CSV, formatting blockRows rows per write.
+   # prefix is written at the start of every row.
+   # Returns: None
+   table = np.asarray(table,dtype=float)
+   rowFormat = prefix+','.join(['%.17g']*table.shape[1])+'\n'
+   for start in range(0,len(table),blockRows):
+      block = table[start:start+blockRows]
+      file.write((rowFormat*len(block)) % tuple(block.ravel()))
+
+def saveCsv(path,results,parameters=None):
+   # Writes the series of one run as CSV, preceded by its metadata as a
+   # '# '-prefixed JSON line. The series of Streaming.simulate results are
+   # read from their .npy file a block at a time (see fullSeries).
+   # Returns: None
+   names = columns(results)
+   series = fullSeries(results)
+   with open(path,'w',buffering=bufferSize) as file:
+      file.write('# '+json.dumps(metadata(results,parameters))+'\n')
+      file.write(','.join(names)+'\n')
+      for start in range(0,len(series['t']),blockRows):
+         writeRows(file,np.column_stack([np.asarray(series[name][start:start+blockRows]) for name in names]))
+
+def saveBatchCsv(path,runs):
+   # Writes many runs, given as (results,parameters) pairs, to one long format
+   # CSV with a leading 'run' column. The metadata of run i is written as a
+   # '# run i: ' JSON line before its rows.
+   # Returns: None
+   runs = list(runs)
+   names = []
+   for r,p in runs:
+      names += [name for name in columns(r) if name not in names]
+   names = [name for name in seriesNames if name in names]
+   with open(path,'w',buffering=bufferSize) as file:
+      file.write(','.join(['run']+names)+'\n')
+      for i,(r,p) in enumerate(runs):
+         file.write('# run {}: {}\n'.format(i,json.dumps(metadata(r,p))))
+         n = len(r['t'])
+         for start in range(0,n,blockRows):
+            stop = min(start+blockRows,n)
+            table = np.column_stack([np.asarray(r[name][start:stop]) if name in r else np.full(stop-start,np.nan)
+                                     for name in names])
+            writeRows(file,table,'{},'.format(i))
+
+def saveIndexesCsv(path,runs):
+   # Writes one CSV row per run, given as (results,parameters) pairs, with its
+   # scalar parameters and its performance indexes and Ms.
+   # Returns: None
+   rows = []
+   for r,p in runs:
+      row = {k: v for k,v in plain(p or {}).items() if not isinstance(v,(list,dict))}
+      for FT,values in r.get('indexes',{}).items():
+         for name,value in values.items():
+            row['{}_{}'.format(name,FT)] = plain(value)
+      row['Ms'] = plain(r.get('Ms'))
+      rows.append(row)
+   header = []
+   for row in rows:
+      header += [k for k in row if k not in header]
+   with open(path,'w',buffering=bufferSize) as file:
+      file.write(','.join(header)+'\n')
+      for row in rows:
+         file.write(','.join('' if row.get(k) is None else str(row[k]) for k in header)+'\n')
@@ -9,18 +9,24 @@
 # Libraries.
 import time as sp
 from datetime import datetime
-from PIL import ImageTk, Image
-import numpy as np
-from scipy import integrate
-import control as co
 import tkinter as tk
 import tkinter.messagebox
+import tkinter.filedialog
 from tkinter import font
 from tkinter import ttk
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg,NavigationToolbar2Tk
-from matplotlib.figure import Figure
 import platform
+import Lazy
+import Timing
+from Worker import SimulationWorker
+from Plotting import PlotPanel, Decimator
+# Heavy libraries, loaded after the window is shown (see Lazy.py).
+co = Lazy.module('control')
+sim = Lazy.module('Simulation')
+Tuner = Lazy.module('Tuner')
+Export = Lazy.module('Export')
+matplotlib = Lazy.module('matplotlib')
+mplFigure = Lazy.module('matplotlib.figure')
+backendTk = Lazy.module('matplotlib.backends.backend_tkagg')
 
 #################################################
 #######       BASIC WINDOW SETTINGS       #######
@@ -72,15 +78,21 @@ types = ["Standard", "Series", "Parallel"]
 processSelect = tk.StringVar()
 typesProc = ["Standard", "Alt."]
 
-# ReRun Prevention
-changeP = tk.IntVar(mainWindow, 0)
-changeI = tk.IntVar(mainWindow, 0)
-changeD = tk.IntVar(mainWindow, 0)
-changeSlide = tk.IntVar(mainWindow, 0)
-changeContPlant = tk.IntVar(mainWindow, 0)
+# Realtime execution.
 realtimeExecute = tk.IntVar(mainWindow, 0)
-changeContType = tk.IntVar(mainWindow, 0)
-changeSimData = tk.IntVar(mainWindow, 0)
+realtimeJob = None  # Pending realtime run scheduled with mainWindow.after.
+realtimeDelay = 16  # ms, coalesces change events to at most one run per frame.
+realtimeEngine = 'discrete'  # Simulation engine used while dragging sliders.
+
+# Background simulation worker.
+worker = SimulationWorker()
+popupWorker = SimulationWorker('popup')  # View pop-ups, never superseded by realtime runs.
+tuneWorker = SimulationWorker('tuning')  # Auto-tuning runs on its own thread, so simulations never supersede it.
+workerPoll = 5  # ms between checks for finished simulations.
+tuning = None  # Future of the auto-tuning in progress.
+lastRun = None  # (results,parameters) of the last displayed simulation, for exporting.
+stageTimes = Timing.Rolling()  # Stage durations of the last realtime runs.
+realtimeMonitor = Timing.RealtimeMonitor()  # Latency, frame rate and dropped updates of realtime mode.
 
 # Sector A.
 plantNum = tk.StringVar(mainWindow,'[1,2,3,...]')  # Hint text.
@@ -90,6 +102,8 @@ contNum = tk.StringVar(mainWindow,'[1,2,3,...]')
 contDen = tk.StringVar(mainWindow,'[1,2,3,...]')
 padeVal = tk.IntVar(mainWindow, 10)
 padeVal.set(10)
+exactDeadTime = tk.IntVar()
+autoPade = tk.IntVar()
 eqP = tk.StringVar()
 exp = tk.StringVar()
 eqC = tk.StringVar()
@@ -120,8 +134,18 @@ magS = tk.DoubleVar()
 magR = tk.DoubleVar()
 check = tk.IntVar()
 checkType = tk.IntVar()
+adaptiveGrid = tk.IntVar()
+gridTolerance = tk.DoubleVar()
+gridTolerance.set(0.001)
+analyticMetrics = tk.IntVar()
 # Sector C.
 graphics = tk.IntVar()
+tuneIndex = tk.StringVar()
+showTimings = tk.IntVar()
+logTimings = tk.IntVar()
+showStatus = tk.IntVar()
+statusText = tk.StringVar(mainWindow,'Realtime: no updates yet')
+tuneMaxTV = tk.StringVar()
 # Sector E.
 position = tk.IntVar()
 # Sector F.
@@ -143,6 +167,9 @@ valueSetValue.set(0)
 ## Menu/Hotkeys functions. ##
 #############################
 def close():
+   worker.shutdown()
+   popupWorker.shutdown()
+   tuneWorker.shutdown()
    mainWindow.quit()
    mainWindow.destroy()
 
@@ -191,6 +218,13 @@ controller Transfer Funtion will be displayed below the "C(s) Transfer Function"
 are two "Reset Values" buttons: the one on the left resets all of the Process information, while the
 one on the right resets the Controller information.
 
+The dead time is approximated by a Pade approximation of the entered "Pade Degree". Checking "Exact
+dead time" simulates it exactly instead, with a delay line between the controller and the process:
+the Pade degree is then not used, long dead times simulate faster and more accurately, and the ISE
+is always integrated over the time grid. Checking "Auto Pade degree" picks the lowest degree whose
+phase error stays within 0.01 rad up to the bandwidth of the closed loop (of the process in Process
+mode); the degree used is shown below the Maximum Sensitivity.
+
 Finally, clicking on the question mark button will show you the closed loop configuration used for
 this tool.
 
@@ -205,6 +239,15 @@ A positive value must be entered on the "Simulation time" box. On the "Time unit
 to select among three different time units for the simulations: seconds, minutes and hours. There's
 also a "Reset Values" button to restore to default values all the entry boxes of this section.
 
+By default every simulation uses 5001 time samples. Checking the "Adaptive" time grid option picks
+the number of samples from the fastest closed loop poles and the dead time, so that the integration
+error stays close to the "Grid tolerance" value: slow loops use fewer samples and fast loops more.
+
+Checking the "Analytic ISE" option computes the ISE of step responses in closed form from the loop
+model instead of integrating the simulated error, so it has no time grid or simulation time error.
+It also reports ISU, the integral of the squared deviation of the control signal from its final
+value. Ramp inputs, unstable loops and errors that do not vanish use the simulated ISE.
+
 GRAPHICS.
 
 On this section, the transfer function used for the simulations is determined. There are up to four
@@ -218,6 +261,27 @@ control signal responses.
 Finally, the "Run" button will begin the simulation and the "Reset ALL" button will reset to default
 all the input data on the "General Data", "Simulation Data" and "Graphics" sections.
 
+The "Auto-Tune" button searches, starting from the current controller sliders, the Kp, Ti (Ki), Td
+(Kd) and alpha values that minimize the "Tune index" of the step response of the selected control
+mode (both responses are added in the "Servo and Regulatory" mode) for the process defined by the
+sliders. If a "Max TVu" value is entered, tunings whose control effort exceeds it are penalized. The
+search stays within the slider ranges and resolutions and the optimum is written back to the sliders.
+
+The "Export" button saves the time, input and response series of the last simulation, together with
+its parameters and performance indexes, as a NumPy archive (.npz) or a CSV file.
+
+Checking "Show stage timings" adds to the Response Parameters the time spent by every stage of a run:
+reading and converting the inputs, the Pade approximation, the transfer function and loop algebra,
+the maximum sensitivity, the simulation, the indexes and drawing the results. In realtime mode the
+median (p50) and 95th percentile (p95) of the last runs are also shown. Checking "Log stage times"
+in the Simulation menu also writes the timings of every run to the console, through the
+"simulator.timing" logger.
+
+Checking "Show realtime status" shows a status bar below the data sectors with the responsiveness of
+realtime mode: the latency from a slider or data change to the drawn results (median and 95th
+percentile), the frames drawn per second, the runs dropped because a newer change superseded them
+before they were drawn and the number of change events received.
+
 RESPONSE PARAMETERS
 
 On this section the performance and robustness indicators computed for the system are shown. Those 
@@ -300,17 +364,27 @@ def setValue():
 def get_current_value():
     return '{: .2f}'.format(current_value.get())
 
+def scheduleRealtime(*args):
+    # Schedules a realtime run after a change, unless one is already pending.
+    # A burst of slider events is coalesced into a single run per frame and no
+    # work is done while nothing changes.
+    global realtimeJob
+    if realtimeExecute.get() == 1 and checkType.get() == 2:
+        realtimeMonitor.changed()
+    if realtimeExecute.get() == 1 and checkType.get() == 2 and realtimeJob is None:
+        realtimeJob = mainWindow.after(realtimeDelay, simulatorRealtime)
+
 def pSlider_changed(event):
-    changeP.set(1)
+    scheduleRealtime()
     
 def iSlider_changed(event):
-    changeI.set(1)
+    scheduleRealtime()
     
 def dSlider_changed(event):
-    changeD.set(1)
+    scheduleRealtime()
     
 def sliderChanged(event):
-    changeSlide.set(1)
+    scheduleRealtime()
 
 def checkRealtime(*args):
     realtimeExecute.set(1)
@@ -321,7 +395,7 @@ def checkRealtime(*args):
         runButton.configure(state= 'disabled')
 
 def changeLabelsForPIDType(*args):
-    changeContPlant.set(1)
+    scheduleRealtime()
     if(controllerSelect.get() == "Standard"):
         propLabel.config(text="Kp")
         intLabel.config(text="Ti")
@@ -377,7 +451,7 @@ def changeLabelsForPIDType(*args):
         cont7.config(textvariable=eqVoid)
 
 def changeLabelsForProcessType(*args):
-    changeContPlant.set(1)
+    scheduleRealtime()
     if(processSelect.get() == "Standard"):
         procPLabel.config(text="DC Gain")
         procFreqLabel.config(text="Natural\nFrequency")
@@ -412,13 +486,17 @@ def changeLabelsForProcessType(*args):
         proc6.config(textvariable=exp)
 
 def controlTypeChange(*args):
-    changeContType.set(1)
+    scheduleRealtime()
 
 def simDataChange(*args):
-    changeSimData.set(1)
+    scheduleRealtime()
   
 def stopRealtime(*args):
+    global realtimeJob
     realtimeExecute.set(0)
+    if realtimeJob is not None:
+        mainWindow.after_cancel(realtimeJob)
+        realtimeJob = None
     stopButton.focus()
     runButton.configure(state= 'normal')
 
@@ -524,6 +602,9 @@ def discreteOptionLock(*args):
     contDOption.configure(state= 'disabled')
     loadRangeButton.configure(state= 'disabled')
     loadValueButton.configure(state= 'disabled')
+    # Auto-tuning writes to the sliders, which are not used in Discrete mode.
+    tuneButton.configure(state= 'disabled')
+    cancelTuning()
 
 def realtimeOptionLock(*args):
     pnumEntry.configure(state= 'disabled')
@@ -549,6 +630,8 @@ def realtimeOptionLock(*args):
     contDOption.configure(state= 'normal')
     loadRangeButton.configure(state= 'normal')
     loadValueButton.configure(state= 'normal')
+    if tuning is None:
+        tuneButton.configure(state= 'normal')
 
 def stepOptionLock(*args):
    stepEntry.configure(state='normal')
@@ -592,11 +675,15 @@ def resetInputs():
    stepEntry.insert(0,'0')
    rampEntry.insert(0, '0')
    rampEntry.configure(state='disabled')
+   adaptiveGrid.set(0)
+   gridTolerance.set(0.001)
+   analyticMetrics.set(0)
    if(realtimeExecute.get() == 1):
     stopRealtime()
 
 def masterReset(*args):
    allResetButton.focus()
+   cancelTuning()
    pnumEntry.delete(0,'end');pdenEntry.delete(0,'end')
    cnumEntry.delete(0,'end');cdenEntry.delete(0,'end')
    plantDelay.delete(0,'end');timeEntry.delete(0,'end')
@@ -615,262 +702,146 @@ def masterReset(*args):
    param.delete(1.0,'end')
    param.insert('end','')
    param.configure(state='disabled')
-   buttonNW.pack_forget();buttonNE.pack_forget()
-   buttonSW.pack_forget();buttonSE.pack_forget()
-   canvas1.get_tk_widget().pack_forget()
-   canvas2.get_tk_widget().pack_forget()
-   canvas3.get_tk_widget().pack_forget()
-   canvas4.get_tk_widget().pack_forget()
+   if panel1 is not None:
+      panel1.hide();panel2.hide();panel3.hide();panel4.hide()
    if(realtimeExecute.get() == 1):
     stopRealtime()
 
-def masterButton():
-   axI.clear();axII.clear();axIII.clear();axIV.clear()
-   # Shortened version of simulator code.
-   units = timeUnits.get()
-   time = simTime.get()
-   t = np.linspace(0,time,5001)
-   magStep = magS.get()
-   magRamp = magR.get()
-   timeIn = inTime.get()
-   state = check.get()
-   if state == 1: In = 'step'
-   else: In = 'ramp'
-   transfer = graphics.get()
-   if transfer == 1: mode = 'servo'
-   elif transfer == 2: mode = 'reg'
-   elif transfer == 3: mode = 'both'
-   else: mode = 'process'
-   numeratorP = plantNum.get()
-   numP = conversion(numeratorP)
-   denominatorP = plantDen.get()
-   denP = conversion(denominatorP)
-   A = co.tf(numP,denP)
-   dT = deadTime.get()
-   L = float(dT)
-   numPade,denPade = co.pade(L,n=10)
-   Pade = co.tf(numPade,denPade)
-   P = A*Pade
+def autoTune(*args):
+   # Searches the controller slider values that minimize the selected index in
+   # the background worker and writes them back to the sliders when done.
+   # Returns: None
+   tuneButton.focus()
+   if checkType.get() != 2:
+      tkinter.messagebox.showerror('Auto-Tune Error', """AUTO-TUNE ERROR: Auto-tuning adjusts the slider values.
+Please select the Realtime mode.""")
+      return
+   data = readSimulationData()
+   if data is None: return
+   time,magnitude,timeIn,In,mode = data
    if mode == 'process':
-      if In == 'step':
-         tP,yP,inP = response(P,magStep,timeIn,t,In)
-      elif In == 'ramp':
-         tP,yP,inP = response(P,magRamp,timeIn,t,In) 
-      axI.plot(tP,inP,':m',label='r(t)')
-      axI.plot(tP,yP,'-b',label='y(t)');axI.legend()
-      axI.set_xlabel('Time ({})'.format(units));axI.set_ylabel('Amplitude')
-   else:
-      numeratorC = contNum.get()
-      numC = conversion(numeratorC)
-      denominatorC = contDen.get()
-      denC = conversion(denominatorC)
-      C = co.tf(numC,denC)
-      MYR = (C*P)/(1+C*P)
-      MYD = P/(1+C*P)
-      UR = C/(1+C*P)
-      UD = (-C*P)/(1+C*P)
-      if mode == 'servo':
-         if In == 'step':
-            tServo,yServo,inServo = response(MYR,magStep,timeIn,t,In)
-            tUR,yUR,inUR = response(UR,magStep,timeIn,t,In)
-         elif In == 'ramp':
-            tServo,yServo,inServo = response(MYR,magRamp,timeIn,t,In)
-            tUR,yUR,inUR = response(UR,magRamp,timeIn,t,In)
-         axI.plot(tServo,inServo,':m',label='r(t)')
-         axI.plot(tServo,yServo,'-b',label='yr(t)');axI.legend()
-         axI.set_xlabel('Time ({})'.format(units));axI.set_ylabel('Amplitude')
-         axII.plot(tServo,inServo,':m',label='r(t)')
-         axII.plot(tUR,yUR,'-b',label='ur(t)');axII.legend()
-         axII.set_xlabel('Time ({})'.format(units));axII.set_ylabel('Amplitude')
-         if In == 'step':
-            tP,yP,inP = response(P,magStep,timeIn,t,In)
-         elif In == 'ramp':
-            tP,yP,inP = response(P,magRamp,timeIn,t,In)
-         axIII.plot(tP,inP,':m',label='r(t)')
-         axIII.plot(tP,yP,'-b',label='y(t)');axIII.legend()
-         axIII.set_xlabel('Time ({})'.format(units));axIII.set_ylabel('Amplitude');axIII.set_title('Process Natural Response')
-      elif mode == 'reg':
-         if In == 'step':
-            tReg,yReg,inReg = response(MYD,magStep,timeIn,t,In)
-            tUD,yUD,inUD = response(UD,magStep,timeIn,t,In)
-         elif In == 'ramp':
-            tReg,yReg,inReg = response(MYD,magRamp,timeIn,t,In)
-            tUD,yUD,inUD = response(UD,magRamp,timeIn,t,In)
-         axI.plot(tReg,inReg,':m',label='d(t)')
-         axI.plot(tReg,yReg,'-b',label='yd(t)');axI.legend()
-         axI.set_xlabel('Time ({})'.format(units));axI.set_ylabel('Amplitude')
-         axII.plot(tReg,inReg,':m',label='d(t)')
-         axII.plot(tUD,yUD,'-b',label='ud(t)');axII.legend()
-         axII.set_xlabel('Time ({})'.format(units));axII.set_ylabel('Amplitude')
-         if In == 'step':
-            tP,yP,inP = response(P,magStep,timeIn,t,In)
-         elif In == 'ramp':
-            tP,yP,inP = response(P,magRamp,timeIn,t,In)
-         axIII.plot(tP,inP,':m',label='r(t)')
-         axIII.plot(tP,yP,'-b',label='y(t)');axIII.legend()
-         axIII.set_xlabel('Time ({})'.format(units));axIII.set_ylabel('Amplitude');axIII.set_title('Process Natural Response')
-      elif mode == 'both':
-         if In == 'step':
-            tServo,yServo,inServo = response(MYR,magStep,timeIn,t,In)
-            tUR,yUR,inUR = response(UR,magStep,timeIn,t,In)
-            tReg,yReg,inReg = response(MYD,magStep,timeIn,t,In)
-            tUD,yUD,inUD = response(UD,magStep,timeIn,t,In)
-         elif In == 'ramp':
-            tServo,yServo,inServo = response(MYR,magRamp,timeIn,t,In)
-            tUR,yUR,inUR = response(UR,magRamp,timeIn,t,In)
-            tReg,yReg,inReg = response(MYD,magRamp,timeIn,t,In)
-            tUD,yUD,inUD = response(UD,magRamp,timeIn,t,In)
-         axI.plot(tServo,inServo,':m',label='r(t)')
-         axI.plot(tServo,yServo,'-b',label='yr(t)');axI.legend()
-         axI.set_xlabel('Time ({})'.format(units));axI.set_ylabel('Amplitude')
-         axII.plot(tServo,inServo,':m',label='r(t)')
-         axII.plot(tUR,yUR,'-b',label='ur(t)');axII.legend()
-         axII.set_xlabel('Time ({})'.format(units));axII.set_ylabel('Amplitude')
-         axIII.plot(tServo,inServo,':m',label='d(t)')
-         axIII.plot(tReg,yReg,'-b',label='yd(t)');axIII.legend()
-         axIII.set_xlabel('Time ({})'.format(units));axIII.set_ylabel('Amplitude')
-         axIV.plot(tServo,inServo,':m',label='d(t)')
-         axIV.plot(tUD,yUD,'-b',label='ud(t)');axIV.legend()
-         axIV.set_xlabel('Time ({})'.format(units));axIV.set_ylabel('Amplitude')
-   var = position.get()
-   if var == 1: F = figI
-   elif var == 2: F = figII
-   elif var == 3: F = figIII
-   else: F = figIV
+      tkinter.messagebox.showerror('Auto-Tune Error', """AUTO-TUNE ERROR: The reaction curve has no controller to tune.
+Please select a control mode.""")
+      return
+   maxTV = None
+   if tuneMaxTV.get().strip() != '':
+      try:
+         maxTV = float(tuneMaxTV.get())
+      except ValueError:
+         maxTV = 0
+      if maxTV <= 0:
+         maxTVEntry.focus()
+         tkinter.messagebox.showerror('Value Error', """VALUE ERROR: Invalid TVu limit.
+Please enter a positive number or leave the box empty.""")
+         return
+   numP,denP = sim.processPolynomials(processSelect.get(),plantPValue.get(),plantTauValue.get(),plantZetaValue.get())
+   sliders = (barraP,barraI,barraD,barraAlpha)
+   start = (pValue.get(),iValue.get(),dValue.get(),alphaValue.get())
+   resolution = [float(s.cget('resolution')) for s in sliders]
+   bounds = [(float(s.cget('from')),float(s.cget('to'))) for s in sliders]
+   # Ti and alpha divide the controller coefficients, so they stay positive.
+   if controllerSelect.get() != 'Parallel':
+      bounds[1] = (max(bounds[1][0],resolution[1]),bounds[1][1])
+   bounds[3] = (max(bounds[3][0],resolution[3]),bounds[3][1])
+   global tuning
+   index = tuneIndex.get();controllerType = controllerSelect.get()
+   tuning = tuneWorker.submit(Tuner.tune,numP,denP,plantDeadValue.get(),padeMode(),controllerType,start,bounds,time,
+                              index,mode,maxTV,magnitude if In == 'step' else 1.,timeIn,
+                              metrics=metricsMode(),resolution=resolution)
+   tuneButton.configure(state='disabled')
+   mainWindow.after(workerPoll,collectTuning,tuning,mode,index,controllerType)
+
+def cancelTuning():
+   # Discards the auto-tuning in progress, if any. Its search still runs to
+   # the end on the tuning thread, but the result is not used.
+   # Returns: None
+   if tuning is not None:
+      tuneWorker.cancel()
 
-   # Pop-up window.
-   figWindow1 = tk.Toplevel(mainWindow)
-   figWindow1.geometry('700x550')
-   figWindow1.resizable(False,False)
-   canvasI = FigureCanvasTkAgg(F,master=figWindow1)
-   canvasI.get_tk_widget()
-   toolbarI = NavigationToolbar2Tk(canvasI,figWindow1)
-   toolbarI.update()
-   canvasI.get_tk_widget().pack(side=tk.TOP,fill=tk.BOTH,expand=1)
+def collectTuning(future,mode,index,controllerType):
+   # Writes the auto-tuning result to the sliders and the Response Parameters.
+   # index and controllerType are those of the search, since the widgets may
+   # have changed while it ran.
+   # Returns: None
+   global tuning
+   if not tuneWorker.isCurrent(future):
+      tuning = None
+      tuneButton.configure(state='normal' if checkType.get() == 2 else 'disabled')
+      tkinter.messagebox.showinfo('Auto-Tune Cancelled','The auto-tuning in progress was cancelled. Its result was discarded.')
+      return
+   if not future.done():
+      mainWindow.after(workerPoll,collectTuning,future,mode,index,controllerType)
+      return
+   tuning = None
+   tuneButton.configure(state='normal' if checkType.get() == 2 else 'disabled')
+   try:
+      result = future.result()
+   except ValueError:
+      tkinter.messagebox.showerror('Auto-Tune Error','AUTO-TUNE ERROR: The process or controller data is not valid.')
+      return
+   except Exception as error:
+      tkinter.messagebox.showerror('Auto-Tune Error','AUTO-TUNE ERROR: {}: {}'.format(type(error).__name__,error))
+      return
+   if result['indexes'] is None:
+      tkinter.messagebox.showerror('Auto-Tune Error', """AUTO-TUNE ERROR: No stabilizing tuning was found.
+Please start from other slider values or ranges.""")
+      return
+   kp,ki,kd,alpha = result['params']
+   barraP.set(kp);barraI.set(ki);barraD.set(kd);barraAlpha.set(alpha)
+   text = """
+AUTO-TUNE ({} {})
+Kp = {}, I = {}, D = {}, alpha = {}
+{} = {}, TVu = {}{}
+{} evaluations
+""".format(controllerType,mode.upper(),kp,ki,kd,alpha,index,round(result['indexes'][index],7),
+             round(result['indexes']['TV'],7),'' if result['feasible'] else ' (over the limit)',result['evaluations'])
+   param.configure(state='normal')
+   param.insert(tk.END,text)
+   param.see('end')
+   param.configure(state='disabled')
 
-def masterButtonRealtime():
-   axI.clear();axII.clear();axIII.clear();axIV.clear()
-   # Shortened version of simulator code.
-   units = timeUnits.get()
-   time = simTime.get()
-   t = np.linspace(0,time,5001)
-   magStep = magS.get()
-   magRamp = magR.get()
-   timeIn = inTime.get()
-   state = check.get()
-   if state == 1: In = 'step'
-   else: In = 'ramp'
-   transfer = graphics.get()
-   if transfer == 1: mode = 'servo'
-   elif transfer == 2: mode = 'reg'
-   elif transfer == 3: mode = 'both'
-   else: mode = 'process'
-   if(processSelect.get() == "Standard"):
-         numeratorP = [plantPValue.get()*(plantTauValue.get()**2)]
-   else:
-         numeratorP = [plantPValue.get()]
-   numP = [float(x) for x in numeratorP]
-   if(processSelect.get() == "Standard"):
-         denominatorP = [1,(2*plantTauValue.get()*plantZetaValue.get()),plantTauValue.get()**2]
-   else:
-         denominatorP = [plantZetaValue.get()*plantTauValue.get()**2,plantTauValue.get()*(plantZetaValue.get()+1),1]
-   denP = [float(x) for x in denominatorP]
-   A = co.tf(numP,denP)
-   dT = plantDeadValue.get()
-   L = float(dT)
-   numPade,denPade = co.pade(L,n=10)
-   Pade = co.tf(numPade,denPade)
-   P = A*Pade
+def popupPlot(results,mode,units):
+   # Plots the simulation results on the pop-up figures.
+   # Returns: None
+   buildPlots()
+   plotI.clear();plotII.clear();plotIII.clear();plotIV.clear()
+   t = results['t'];inp = results['input']
    if mode == 'process':
-      if In == 'step':
-         tP,yP,inP = response(P,magStep,timeIn,t,In)
-      elif In == 'ramp':
-         tP,yP,inP = response(P,magRamp,timeIn,t,In) 
-      axI.plot(tP,inP,':m',label='r(t)')
-      axI.plot(tP,yP,'-b',label='y(t)');axI.legend()
+      plotI.plot(t,inp,':m',label='r(t)')
+      plotI.plot(t,results['P'],'-b',label='y(t)');axI.legend()
       axI.set_xlabel('Time ({})'.format(units));axI.set_ylabel('Amplitude');axI.set_title('Process Natural Response')
+      plotI.refresh()
+      return
+   if mode == 'servo' or mode == 'both':
+      plotI.plot(t,inp,':m',label='r(t)')
+      plotI.plot(t,results['MYR'],'-b',label='yr(t)');axI.legend()
+      axI.set_xlabel('Time ({})'.format(units));axI.set_ylabel('Amplitude');axI.set_title('System Response (Servo)')
+      plotII.plot(t,inp,':m',label='r(t)')
+      plotII.plot(t,results['UR'],'-b',label='ur(t)');axII.legend()
+      axII.set_xlabel('Time ({})'.format(units));axII.set_ylabel('Amplitude');axII.set_title('Controller Response (Servo)')
+   if mode == 'reg':
+      plotI.plot(t,inp,':m',label='d(t)')
+      plotI.plot(t,results['MYD'],'-b',label='yd(t)');axI.legend()
+      axI.set_xlabel('Time ({})'.format(units));axI.set_ylabel('Amplitude');axI.set_title('System Response (Regulatory)')
+      plotII.plot(t,inp,':m',label='d(t)')
+      plotII.plot(t,results['UD'],'-b',label='ud(t)');axII.legend()
+      axII.set_xlabel('Time ({})'.format(units));axII.set_ylabel('Amplitude');axII.set_title('Controller Response (Regulatory)')
+   if mode == 'both':
+      plotIII.plot(t,inp,':m',label='d(t)')
+      plotIII.plot(t,results['MYD'],'-b',label='yd(t)');axIII.legend()
+      axIII.set_xlabel('Time ({})'.format(units));axIII.set_ylabel('Amplitude');axIII.set_title('System Response (Regulatory)')
+      plotIV.plot(t,inp,':m',label='d(t)')
+      plotIV.plot(t,results['UD'],'-b',label='ud(t)');axIV.legend()
+      axIV.set_xlabel('Time ({})'.format(units));axIV.set_ylabel('Amplitude');axIV.set_title('Controller Response (Regulatory)')
    else:
-      if(controllerSelect.get() == "Standard"):
-        numeratorC = [((alphaValue.get()+1)*pValue.get()*dValue.get()*iValue.get()),pValue.get()*((alphaValue.get()*dValue.get()+iValue.get())),pValue.get()]
-      elif(controllerSelect.get() == "Parallel"):
-        numeratorC = [dValue.get()*(alphaValue.get()*pValue.get()+1), pValue.get()+(alphaValue.get()*iValue.get()*dValue.get()), iValue.get()]
-      elif(controllerSelect.get() == "Series"):
-        numeratorC = [pValue.get()*iValue.get()*dValue.get(), iValue.get()+dValue.get(), pValue.get()]
-      numC = [float(x) for x in numeratorC]
-      if(controllerSelect.get() == "Standard"):
-        denC = [(alphaValue.get()*dValue.get()*iValue.get()),iValue.get(),0]
-      elif(controllerSelect.get() == "Parallel"):
-        denC = [alphaValue.get()*dValue.get(),1,0]
-      elif(controllerSelect.get() == "Series"):
-        denC = [alphaValue.get()*iValue.get()*dValue.get(), iValue.get(), 0]
-      C = co.tf(numC,denC)
-      MYR = (C*P)/(1+C*P)
-      MYD = P/(1+C*P)
-      UR = C/(1+C*P)
-      UD = (-C*P)/(1+C*P)
-      if mode == 'servo':
-         if In == 'step':
-            tServo,yServo,inServo = response(MYR,magStep,timeIn,t,In)
-            tUR,yUR,inUR = response(UR,magStep,timeIn,t,In)
-         elif In == 'ramp':
-            tServo,yServo,inServo = response(MYR,magRamp,timeIn,t,In)
-            tUR,yUR,inUR = response(UR,magRamp,timeIn,t,In)
-         axI.plot(tServo,inServo,':m',label='r(t)')
-         axI.plot(tServo,yServo,'-b',label='yr(t)');axI.legend()
-         axI.set_xlabel('Time ({})'.format(units));axI.set_ylabel('Amplitude');axI.set_title('System Response (Servo)')
-         axII.plot(tServo,inServo,':m',label='r(t)')
-         axII.plot(tUR,yUR,'-b',label='ur(t)');axII.legend()
-         axII.set_xlabel('Time ({})'.format(units));axII.set_ylabel('Amplitude');axII.set_title('Controller Response (Servo)')
-         if In == 'step':
-            tP,yP,inP = response(P,magStep,timeIn,t,In)
-         elif In == 'ramp':
-            tP,yP,inP = response(P,magRamp,timeIn,t,In)
-         axIII.plot(tP,inP,':m',label='r(t)')
-         axIII.plot(tP,yP,'-b',label='y(t)');axIII.legend()
-         axIII.set_xlabel('Time ({})'.format(units));axIII.set_ylabel('Amplitude');axIII.set_title('Process Natural Response')
-      elif mode == 'reg':
-         if In == 'step':
-            tReg,yReg,inReg = response(MYD,magStep,timeIn,t,In)
-            tUD,yUD,inUD = response(UD,magStep,timeIn,t,In)
-         elif In == 'ramp':
-            tReg,yReg,inReg = response(MYD,magRamp,timeIn,t,In)
-            tUD,yUD,inUD = response(UD,magRamp,timeIn,t,In)
-         axI.plot(tReg,inReg,':m',label='d(t)')
-         axI.plot(tReg,yReg,'-b',label='yd(t)');axI.legend()
-         axI.set_xlabel('Time ({})'.format(units));axI.set_ylabel('Amplitude');axI.set_title('System Response (Regulatory)')
-         axII.plot(tReg,inReg,':m',label='d(t)')
-         axII.plot(tUD,yUD,'-b',label='ud(t)');axII.legend()
-         axII.set_xlabel('Time ({})'.format(units));axII.set_ylabel('Amplitude');axII.set_title('Controller Response (Regulatory)')
-         if In == 'step':
-            tP,yP,inP = response(P,magStep,timeIn,t,In)
-         elif In == 'ramp':
-            tP,yP,inP = response(P,magRamp,timeIn,t,In)
-         axIII.plot(tP,inP,':m',label='r(t)')
-         axIII.plot(tP,yP,'-b',label='y(t)');axIII.legend()
-         axIII.set_xlabel('Time ({})'.format(units));axIII.set_ylabel('Amplitude');axIII.set_title('Process Natural Response')
-      elif mode == 'both':
-         if In == 'step':
-            tServo,yServo,inServo = response(MYR,magStep,timeIn,t,In)
-            tUR,yUR,inUR = response(UR,magStep,timeIn,t,In)
-            tReg,yReg,inReg = response(MYD,magStep,timeIn,t,In)
-            tUD,yUD,inUD = response(UD,magStep,timeIn,t,In)
-         elif In == 'ramp':
-            tServo,yServo,inServo = response(MYR,magRamp,timeIn,t,In)
-            tUR,yUR,inUR = response(UR,magRamp,timeIn,t,In)
-            tReg,yReg,inReg = response(MYD,magRamp,timeIn,t,In)
-            tUD,yUD,inUD = response(UD,magRamp,timeIn,t,In)
-         axI.plot(tServo,inServo,':m',label='r(t)')
-         axI.plot(tServo,yServo,'-b',label='yr(t)');axI.legend()
-         axI.set_xlabel('Time ({})'.format(units));axI.set_ylabel('Amplitude');axI.set_title('System Response (Servo)')
-         axII.plot(tServo,inServo,':m',label='r(t)')
-         axII.plot(tUR,yUR,'-b',label='ur(t)');axII.legend()
-         axII.set_xlabel('Time ({})'.format(units));axII.set_ylabel('Amplitude');axII.set_title('Controller Response (Servo)')
-         axIII.plot(tServo,inServo,':m',label='d(t)')
-         axIII.plot(tReg,yReg,'-b',label='yd(t)');axIII.legend()
-         axIII.set_xlabel('Time ({})'.format(units));axIII.set_ylabel('Amplitude');axIII.set_title('System Response (Regulatory)')
-         axIV.plot(tServo,inServo,':m',label='d(t)')
-         axIV.plot(tUD,yUD,'-b',label='ud(t)');axIV.legend()
-         axIV.set_xlabel('Time ({})'.format(units));axIV.set_ylabel('Amplitude');axIV.set_title('Controller Response (Regulatory)')
+      plotIII.plot(t,inp,':m',label='r(t)')
+      plotIII.plot(t,results['P'],'-b',label='y(t)');axIII.legend()
+      axIII.set_xlabel('Time ({})'.format(units));axIII.set_ylabel('Amplitude');axIII.set_title('Process Natural Response')
+   plotI.refresh();plotII.refresh();plotIII.refresh();plotIV.refresh()
+
+def popupWindow():
+   # Shows the pop-up figure selected by the "View" buttons.
+   # Returns: None
    var = position.get()
    if var == 1: F = figI
    elif var == 2: F = figII
@@ -881,12 +852,65 @@ def masterButtonRealtime():
    figWindow1 = tk.Toplevel(mainWindow)
    figWindow1.geometry('700x550')
    figWindow1.resizable(False,False)
-   canvasI = FigureCanvasTkAgg(F,master=figWindow1)
+   canvasI = backendTk.FigureCanvasTkAgg(F,master=figWindow1)
    canvasI.get_tk_widget()
-   toolbarI = NavigationToolbar2Tk(canvasI,figWindow1)
+   toolbarI = backendTk.NavigationToolbar2Tk(canvasI,figWindow1)
    toolbarI.update()
    canvasI.get_tk_widget().pack(side=tk.TOP,fill=tk.BOTH,expand=1)
 
+def masterButton():
+   # Shortened version of simulator code.
+   data = readSimulationData()
+   grid = readGridSettings() if data is not None else None
+   if grid is None: return
+   time,magnitude,timeIn,In,mode = data
+   numP = sim.conversion(plantNum.get())
+   denP = sim.conversion(plantDen.get())
+   numC = denC = None
+   if mode != 'process':
+      numC = sim.conversion(contNum.get())
+      denC = sim.conversion(contDen.get())
+   popupInBackground(mode,"""SIMULATION ERROR: A non-proper transfer function.
+has been entered.""",numP,denP,deadTime.get(),padeMode(),mode,In,magnitude,timeIn,time,numC,denC,
+                     engine=engineMode(False),metrics=metricsMode(),**grid)
+
+def masterButtonRealtime():
+   # Shortened version of simulator code.
+   data = readSimulationData()
+   grid = readGridSettings() if data is not None else None
+   if grid is None: return
+   time,magnitude,timeIn,In,mode = data
+   numP,denP = sim.processPolynomials(processSelect.get(),plantPValue.get(),plantTauValue.get(),plantZetaValue.get())
+   numC = denC = None
+   if mode != 'process':
+      numC,denC = sim.controllerPolynomials(controllerSelect.get(),pValue.get(),iValue.get(),dValue.get(),alphaValue.get())
+   popupInBackground(mode,"""SIMULATION ERROR: The transfer function is not proper. Is your derivative filter value 0?""",
+                     numP,denP,plantDeadValue.get(),padeMode(),mode,In,magnitude,timeIn,time,numC,denC,
+                     engine=engineMode(True),metrics=metricsMode(),**grid)
+
+def popupInBackground(mode,errorText,*args,**kwargs):
+   # Sends sim.simulate(*args,**kwargs) to the pop-up worker and shows the
+   # results in a pop-up window when done. Only a newer pop-up supersedes it.
+   # Returns: None
+   future = popupWorker.submit(sim.simulate,*args,**kwargs)
+   mainWindow.after(workerPoll,collectPopup,future,mode,errorText,timeUnits.get())
+
+def collectPopup(future,mode,errorText,units):
+   # Plots the results of a background simulation on a pop-up window once it
+   # finishes. Results of superseded simulations are discarded.
+   # Returns: None
+   if not popupWorker.isCurrent(future): return
+   if not future.done():
+      mainWindow.after(workerPoll,collectPopup,future,mode,errorText,units)
+      return
+   try:
+      results = future.result()
+   except Exception as error:
+      simulationError(error,errorText)
+      return
+   popupPlot(results,mode,units)
+   popupWindow()
+
 def figViewNW():
    position.set(1)
    if(checkType.get() == 1):
@@ -918,46 +942,101 @@ def figViewSE():
 ###############################
 ## Simulator core functions. ##
 ###############################
-def conversion(input): 
-   # Converts the input from string to a float array.
-   # Returns: final float array.
-   input = str(input)
-   caracters = "[]"
-   string = input.replace(caracters[0],"").replace(caracters[1],"")  # Remove '[]' from string.
-   list = string.split(',')  # List created from the string. String-type values.
-   final = [float(x) for x in list]  # List of floats created using the first list.
-   return final
-
-def response(tf,ku,tin,time,signal):
-   # Computes the desired step or ramp input of magnitude ku and applied on t=tin.
-    # Computes the system response to the desired input.
-    # Returns: ta,ya,ua: time and response values and the input computed.
-    # Returns: None
-    ntp = len(time)
-    u = np.zeros(ntp)
-    if signal == 'step':
-    # Step with amplitude ku applied on t=tin.
-        for k in range(ntp):
-            u[k] = 0. if time[k] < tin else ku
-        ta,ya = co.forced_response (tf,time,u)
-    elif signal == 'ramp':
-        # Ramp with slope ku aaplied on t=tin.
-        for k in range(ntp):
-            u[k] = 0. if time[k] < tin else ku*time[k]
-        ta,ya = co.forced_response (tf,time,u)
-    return ta,ya,u
-
-def indexes(FT,inputName,yinput,y,t,ua):
-   # Computes de IAE, ISE and ITAE of a given system response.
-   # Also computes de control effort TVu of a given control signal.
+# The math lives in Simulation.py; the functions below read the widgets,
+# call into the simulation core and display its results.
+def readSimulationData():
+   # Reads the Simulation Data and Control Loop Operation sections.
+   # Returns: time,magnitude,timeIn,In,mode or None if an entry is invalid.
+   # Simulation time.
+   try:
+      time = simTime.get()
+   except tkinter.TclError:
+      timeEntry.focus()
+      tkinter.messagebox.showerror('Value Error', """VALUE ERROR: Invalid simulation time value.
+Please enter valid numerical data.""")
+      return None
+   
+   # Step magnitude.
+   try:
+      magStep = magS.get()
+   except tkinter.TclError:
+      stepEntry.focus()
+      tkinter.messagebox.showerror('Value Error', """VALUE ERROR: Invalid step input value.
+Please enter valid numerical data.""")
+      return None
+   
+   # Ramp magnitude.
+   try:
+      magRamp = magR.get()
+   except tkinter.TclError:
+      rampEntry.focus()
+      tkinter.messagebox.showerror('Value Error', """VALUE ERROR: Invalid ramp slope value.
+Please enter valid numerical data.""")
+      return None
+   
+   # Input time.
+   try:
+      timeIn = inTime.get()
+   except tkinter.TclError:
+      tinEntry.focus()
+      tkinter.messagebox.showerror('Value Error', """VALUE ERROR: Invalid input time value.
+Please enter valid numerical data.""")
+      return None
+
+   # Input selection.
+   state = check.get()
+   if state == 1: In = 'step'; magnitude = magStep
+   else: In = 'ramp'; magnitude = magRamp
+
+   # Control mode selection.
+   transfer = graphics.get()
+   if transfer == 1: mode = 'servo'
+   elif transfer == 2: mode = 'reg'
+   elif transfer == 3: mode = 'both'
+   else: mode = 'process'
+   return time,magnitude,timeIn,In,mode
+
+def readGridSettings():
+   # Reads the time grid settings.
+   # Returns: points and tolerance arguments of sim.simulate, or None if the
+   #          tolerance is invalid.
+   if adaptiveGrid.get() == 0:
+      return {'points': 5001}
+   try:
+      tolerance = gridTolerance.get()
+   except tkinter.TclError:
+      tolerance = 0
+   if tolerance <= 0:
+      toleranceEntry.focus()
+      tkinter.messagebox.showerror('Value Error', """VALUE ERROR: Invalid grid tolerance value.
+Please enter a positive number.""")
+      return None
+   return {'points': 'auto','tolerance': tolerance}
+
+def metricsMode():
+   # Returns: metrics argument of sim.simulate.
+   return 'analytic' if analyticMetrics.get() == 1 else 'simulated'
+
+def engineMode(realtime):
+   # Returns: engine argument of sim.simulate.
+   if exactDeadTime.get() == 1: return 'delay'
+   return realtimeEngine if realtime else 'forced'
+
+def padeMode():
+   # Returns: padeOrder argument of sim.simulate.
+   return 'auto' if autoPade.get() == 1 else padeVal.get()
+
+def deadTimeChange(*args):
+   # The Pade degree is not used while the dead time is simulated exactly or
+   # the degree is picked automatically.
+   padeEntry.configure(state='disabled' if exactDeadTime.get() == 1 or autoPade.get() == 1 else 'normal')
+   simDataChange()
+
+def indexes(FT,inputName,metrics):
+   # Displays de IAE, ISE and ITAE of a given system response.
+   # Also displays de control effort TVu of a given control signal.
    # Returns: None
-   if FT == 'MYD': error = -y
-   else: error = yinput-y
-   iae = integrate.trapezoid(np.abs(error),t)
-   ise = integrate.trapezoid(error**2,t)
-   itae = integrate.trapezoid(np.abs(error)*t,t)
-   if FT != 'P': TV = np.sum(np.abs(np.diff(ua)));TV = round(TV,7)
-   iae = round(iae,7);ise = round(ise,7);itae = round(itae,7)
+   iae = round(metrics['IAE'],7);ise = round(metrics['ISE'],7);itae = round(metrics['ITAE'],7)
    inputName = str(inputName).upper()
 
    if FT == 'MYR': 
@@ -967,6 +1046,7 @@ def indexes(FT,inputName,yinput,y,t,ua):
      label0 = 'IAEr'
      label1 = 'ISEr'
      label2 = 'ITAEr'
+     label3 = 'ISUr'
    elif FT == 'MYD':
      C = """REGULATORY CONTROL
 {} INPUT""".format(inputName)
@@ -974,14 +1054,14 @@ def indexes(FT,inputName,yinput,y,t,ua):
      label0 = 'IAEd'
      label1 = 'ISEd'
      label2 = 'ITAEd'
+     label3 = 'ISUd'
    else:
      C = 'REACTION CURVE'
      label0 = 'IAE'
      label1 = 'ISE'
      label2 = 'ITAE'
    if FT != 'P':
-      TV = np.sum(np.abs(np.diff(ua)))
-      TV = round(TV,7)
+      TV = round(metrics['TV'],7)
       results = """
 {}
 
@@ -990,6 +1070,9 @@ def indexes(FT,inputName,yinput,y,t,ua):
 {} = {}
 {} = {}
 """.format(C,T,TV,label0,iae,label1,ise,label2,itae)
+      if metrics.get('ISU') is not None:
+         results += """{} = {}
+""".format(label3,round(metrics['ISU'],7))
    else:
       results = """
 {}
@@ -1003,548 +1086,306 @@ def graph(etq,uin,t1,y1,t2=0,y2=0,t3=0,y3=0,t4=0,y4=0):
    # Plots the system simulations using Matplotlib.
    # Automatically sets the corresponding labels according to the control mode used.
    # Plots the system response (or reaction curve) and control signals in separate Figures.
+   # The plot panels keep their lines and only redraw what changed.
    # Returns: None
+   buildPlots()
+   units = timeUnits.get()
    if etq == 'Process':
-      lab1 = 'y(t)'; labIn1 = 'r(t)'
-      ax1.plot(t1,uin,':m',label=labIn1)
-      ax1.plot(t1,y1,'-b',label=lab1)
-      ax1.legend()
-      units = timeUnits.get()
-      if(scalingFactor < 1.28):
-           plt.rcParams.update({'font.size': 7})
-           ax1.set_xlabel('Time ({})'.format(units), fontsize=7);ax1.set_ylabel('Amplitude', fontsize=7);ax1.set_title('Process Natural Response', fontsize=7)
-           ax1.tick_params(axis='both', which='major', labelsize=7)
-      else:
-           ax1.set_xlabel('Time ({})'.format(units));ax1.set_ylabel('Amplitude');ax1.set_title('Process Natural Response')
-      canvas1.draw();canvas1.get_tk_widget().pack(padx=15)
-      buttonNW.pack(side=tk.BOTTOM)
+      panel1.update(t1,uin,y1,'r(t)','y(t)','Process Natural Response',units)
+      panel2.hide();panel3.hide();panel4.hide()
    elif etq == 'both': 
-      lab1 = 'yr(t)'; lab2 = 'ur(t)'
-      lab3 = 'yd(t)'; lab4 = 'ud(t)'
-      labIn1 = 'r(t)'; labIn2 = 'd(t)'
-      ax1.plot(t1,uin,':m',label=labIn1)
-      ax1.plot(t1,y1,'-b',label=lab1);ax1.legend()
-      ax2.plot(t1,uin,':m',label=labIn1)
-      ax2.plot(t2,y2,'-b',label=lab2);ax2.legend()
-      ax3.plot(t1,uin,':m',label=labIn2)
-      ax3.plot(t3,y3,'-b',label=lab3);ax3.legend()
-      ax4.plot(t1,uin,':m',label=labIn2)
-      ax4.plot(t4,y4,'-b',label=lab4);ax4.legend()
-      units = timeUnits.get()
-      if(scalingFactor < 1.28):
-            plt.rcParams.update({'font.size': 7})
-            ax1.set_xlabel('Time ({})'.format(units), fontsize=7);ax1.set_ylabel('Amplitude', fontsize=7);ax1.set_title('System Response (Servo)', fontsize=7)
-            ax2.set_xlabel('Time ({})'.format(units), fontsize=7);ax2.set_ylabel('Amplitude', fontsize=7);ax2.set_title('Controller Response (Servo)', fontsize=7)
-            ax3.set_xlabel('Time ({})'.format(units), fontsize=7);ax3.set_ylabel('Amplitude', fontsize=7);ax3.set_title('System Response(Regulatory)', fontsize=7)
-            ax4.set_xlabel('Time ({})'.format(units), fontsize=7);ax4.set_ylabel('Amplitude', fontsize=7);ax4.set_title('Controller Response(Regulatory)', fontsize=7)
-            ax1.tick_params(axis='both', which='major', labelsize=7)
-            ax2.tick_params(axis='both', which='major', labelsize=7)
-            ax3.tick_params(axis='both', which='major', labelsize=7)
-            ax4.tick_params(axis='both', which='major', labelsize=7)
-      else:
-            ax1.set_xlabel('Time ({})'.format(units));ax1.set_ylabel('Amplitude');ax1.set_title('System Response (Servo)')
-            ax2.set_xlabel('Time ({})'.format(units));ax2.set_ylabel('Amplitude');ax2.set_title('Controller Response (Servo)')
-            ax3.set_xlabel('Time ({})'.format(units));ax3.set_ylabel('Amplitude');ax3.set_title('System Response(Regulatory)')
-            ax4.set_xlabel('Time ({})'.format(units));ax4.set_ylabel('Amplitude');ax4.set_title('Controller Response(Regulatory)')
-
-      canvas1.draw();canvas1.get_tk_widget().pack(padx=15)
-      canvas2.draw();canvas2.get_tk_widget().pack(padx=15)
-      canvas3.draw();canvas3.get_tk_widget().pack(padx=15)
-      canvas4.draw();canvas4.get_tk_widget().pack(padx=15)
-      buttonNW.pack(side=tk.BOTTOM);buttonNE.pack(side=tk.BOTTOM)
-      buttonSW.pack(side=tk.BOTTOM);buttonSE.pack(side=tk.BOTTOM)
+      panel1.update(t1,uin,y1,'r(t)','yr(t)','System Response (Servo)',units)
+      panel2.update(t2,uin,y2,'r(t)','ur(t)','Controller Response (Servo)',units)
+      panel3.update(t3,uin,y3,'d(t)','yd(t)','System Response(Regulatory)',units)
+      panel4.update(t4,uin,y4,'d(t)','ud(t)','Controller Response(Regulatory)',units)
    else: 
       if etq == 'servo': lab1='yr(t)';lab2='ur(t)';labIn1='r(t)'
       else: lab1='yd(t)';lab2='ud(t)';labIn1='d(t)'
-      lab3 = 'y(t)'; labIn3 = 'r(t)'
-      ax1.plot(t1,uin,':m',label=labIn1)
-      ax1.plot(t1,y1,'-b',label=lab1);ax1.legend()
-      ax2.plot(t1,uin,':m',label=labIn1)
-      ax2.plot(t2,y2,'-b',label=lab2);ax2.legend()
-      ax3.plot(t1,uin,':m',label=labIn3)
-      ax3.plot(t3,y3,'-b',label=lab3);ax3.legend()
-      units = timeUnits.get()
-      if(scalingFactor < 1.28):
-            plt.rcParams.update({'font.size': 7})
-            ax1.set_xlabel('Time ({})'.format(units), fontsize=7);ax1.set_ylabel('Amplitude', fontsize=7);ax1.set_title('System Response', fontsize=7)
-            ax2.set_xlabel('Time ({})'.format(units), fontsize=7);ax2.set_ylabel('Amplitude', fontsize=7);ax2.set_title('Controller Response', fontsize=7)
-            ax3.set_xlabel('Time ({})'.format(units), fontsize=7);ax3.set_ylabel('Amplitude', fontsize=7);ax3.set_title('Process Natural Response', fontsize=7)
-            ax1.tick_params(axis='both', which='major', labelsize=7)
-            ax2.tick_params(axis='both', which='major', labelsize=7)
-            ax3.tick_params(axis='both', which='major', labelsize=7)
-      else:
-            ax1.set_xlabel('Time ({})'.format(units));ax1.set_ylabel('Amplitude');ax1.set_title('System Response')
-            ax2.set_xlabel('Time ({})'.format(units));ax2.set_ylabel('Amplitude');ax2.set_title('Controller Response')
-            ax3.set_xlabel('Time ({})'.format(units));ax3.set_ylabel('Amplitude');ax3.set_title('Process Natural Response')
-      canvas1.draw();canvas1.get_tk_widget().pack(padx=15)
-      canvas2.draw();canvas2.get_tk_widget().pack(padx=15)
-      canvas3.draw();canvas3.get_tk_widget().pack(padx=15)
-      buttonNW.pack(side=tk.BOTTOM);buttonNE.pack(side=tk.BOTTOM);buttonSW.pack(side=tk.BOTTOM)
+      panel1.update(t1,uin,y1,labIn1,lab1,'System Response',units)
+      panel2.update(t2,uin,y2,labIn1,lab2,'Controller Response',units)
+      panel3.update(t3,uin,y3,'r(t)','y(t)','Process Natural Response',units)
+      panel4.hide()
 
-def simulator(*args):
+def showResults(mode,In,results):
+   # Displays the performance indexes, plots and maximum sensitivity of a run.
+   # Returns: None
+   for FT,metrics in results['indexes'].items():
+      indexes(FT,In,metrics)
+   t = results['t']
+   if mode == 'process':
+      graph('Process',results['input'],t,results['P'])
+      ending = '------------------------------'
+   else:
+      series = []
+      for name in sim.modeOutputs[mode]:
+         series += [t,results[name]]
+      graph(mode,results['input'],*series)
+      ending = """
+MAXIMUM SENSITIVITY
+Ms = {}
+------------------------------
+""".format(round(results['Ms'],7))
+   if autoPade.get() == 1 and results['padeOrder'] is not None:
+      ending = """
+PADE DEGREE (AUTO)
+n = {}""".format(results['padeOrder'])+('\n' if mode == 'process' else '')+ending
+   param.configure(state='normal')
+   param.insert(tk.END,ending)
+   param.see('end')
+   param.configure(state='disabled')
+
+def runInBackground(realtime,mode,In,errorText,record,*args,**kwargs):
+   # Sends sim.simulate(*args,**kwargs) to the background worker, superseding
+   # any simulation still pending, and polls for its results from the GUI thread.
+   # The stages of the run are timed in record (see Timing.py).
+   # Returns: None
+   future = worker.submit(Timing.timed,record,sim.simulate,*args,**kwargs)
+   if realtime: realtimeMonitor.started(future)
+   parameters = Export.simulateParameters(*args,**kwargs)
+   mainWindow.after(workerPoll,collectResults,future,realtime,mode,In,errorText,parameters)
+
+def collectResults(future,realtime,mode,In,errorText,parameters):
+   # Displays the results of a background simulation once it finishes.
+   # Results of superseded simulations are discarded.
+   # Returns: None
+   if not worker.isCurrent(future):
+      if realtime:
+         realtimeMonitor.drop(future)
+         realtimeStatus()
+      return
+   if not future.done():
+      mainWindow.after(workerPoll,collectResults,future,realtime,mode,In,errorText,parameters)
+      return
+   try:
+      results,record = future.result()
+   except Exception as error:
+      if realtime: realtimeMonitor.drop(future)
+      simulationError(error,errorText)
+      return
    # GUI settings.
-   runButton.focus()
    now = datetime.now()
    dt_string = now.strftime("%d/%m/%Y %H:%M:%S")  # dd/mm/YY H:M:S
    param.configure(state='normal')
-   param.insert(tk.END,'\n'+dt_string)
+   if realtime:
+      param.delete('1.0', tk.END)
+      param.insert('1.0', dt_string)
+   else:
+      param.insert(tk.END,'\n'+dt_string)
    param.configure(state='disabled')
-   ax1.clear();ax2.clear();ax3.clear();ax4.clear()
-   buttonNW.pack_forget();buttonNE.pack_forget()
-   buttonSW.pack_forget();buttonSE.pack_forget()
-   canvas1.get_tk_widget().pack_forget();canvas2.get_tk_widget().pack_forget()
-   canvas3.get_tk_widget().pack_forget();canvas4.get_tk_widget().pack_forget()
+   global lastRun
+   lastRun = (results,parameters)
+   with Timing.recording(record):
+      with Timing.stage('draw'):
+         showResults(mode,In,results)
+   Timing.log(record,'realtime' if realtime else 'run')
+   if realtime:
+      realtimeMonitor.paint(future)
+      realtimeStatus()
+      stageTimes.add(record)
+   if showTimings.get() == 1: timings(record,realtime)
+
+def simulationError(error,errorText):
+   # Reports a failed background simulation: errorText for invalid data
+   # (ValueError, eg. a numerator degree greater than the denominator degree),
+   # the error itself otherwise.
+   # Returns: None
+   if not isinstance(error,ValueError):
+      errorText = 'SIMULATION ERROR: {}: {}'.format(type(error).__name__,error)
+   tkinter.messagebox.showerror('Simulation Error',errorText)
 
-   # Simulation time.
-   try:
-      time = simTime.get()
-      t = np.linspace(0,time,5001)
-   except tkinter.TclError:
-      timeEntry.focus()
-      tkinter.messagebox.showerror('Value Error', """VALUE ERROR: Invalid simulation time value.
-Please enter valid numerical data.""")
-   
-   # Step magnitude.
-   try:
-      magStep = magS.get()
-   except tkinter.TclError:
-      stepEntry.focus()
-      tkinter.messagebox.showerror('Value Error', """VALUE ERROR: Invalid step input value.
-Please enter valid numerical data.""")
-   
-   # Ramp magnitude.
-   try:
-      magRamp = magR.get()
-   except tkinter.TclError:
-      rampEntry.focus()
-      tkinter.messagebox.showerror('Value Error', """VALUE ERROR: Invalid ramp slope value.
-Please enter valid numerical data.""")
-   
-   # Input time.
+def realtimeStatus():
+   # Refreshes the realtime status bar, if shown.
+   # Returns: None
+   if showStatus.get() == 1:
+      statusText.set(realtimeMonitor.text())
+
+def toggleStatus(*args):
+   # Shows or hides the realtime status bar below sectors A to D.
+   # Returns: None
+   if showStatus.get() == 1:
+      statusBar.grid()
+      realtimeStatus()
+   else:
+      statusBar.grid_remove()
+
+def timings(record,realtime):
+   # Displays the stage durations of a run and, in realtime mode, their
+   # rolling median and 95th percentile.
+   # Returns: None
+   text = """
+STAGE TIMES
+{}
+""".format(record.text())
+   if realtime:
+      text += """
+LAST {} REALTIME RUNS
+{}
+""".format(len(stageTimes.stages['total']),stageTimes.text())
+   param.configure(state='normal')
+   param.insert(tk.END,text)
+   param.see('end')
+   param.configure(state='disabled')
+
+def exportResults(*args):
+   # Saves the series, parameters and indexes of the last simulation as a
+   # numpy archive (.npz) or CSV file.
+   # Returns: None
+   exportButton.focus()
+   if lastRun is None:
+      tkinter.messagebox.showerror('Export Error','EXPORT ERROR: There are no simulation results to export yet.')
+      return
+   path = tkinter.filedialog.asksaveasfilename(defaultextension='.npz',
+                                               filetypes=[('NumPy archive','*.npz'),('CSV file','*.csv')])
+   if not path: return
+   results,parameters = lastRun
    try:
-      timeIn = inTime.get()
-   except tkinter.TclError:
-      tinEntry.focus()
-      tkinter.messagebox.showerror('Value Error', """VALUE ERROR: Invalid input time value.
-Please enter valid numerical data.""")
+      if path.lower().endswith('.csv'): Export.saveCsv(path,results,parameters)
+      else: Export.saveNpz(path,results,parameters)
+   except OSError as error:
+      tkinter.messagebox.showerror('Export Error','EXPORT ERROR: {}'.format(error))
 
-   # Input selection.
-   state = check.get()
-   if state == 1: In = 'step'
-   else: In = 'ramp'
+def simulator(*args):
+   # GUI settings.
+   runButton.focus()
+   record = Timing.Record()
+   start = sp.perf_counter()
 
-   # Control mode selection.
-   transfer = graphics.get()
-   if transfer == 1: mode = 'servo'
-   elif transfer == 2: mode = 'reg'
-   elif transfer == 3: mode = 'both'
-   else: mode = 'process'
+   data = readSimulationData()
+   grid = readGridSettings() if data is not None else None
+   if grid is None: return
+   time,magnitude,timeIn,In,mode = data
 
    # Process data.
    try:
-      numeratorP = plantNum.get()
-      numP = conversion(numeratorP)
+      numP = sim.conversion(plantNum.get())
    except ValueError:
       pnumEntry.focus()
       tkinter.messagebox.showerror('Value Error', """VALUE ERROR: Invalid P(s) numerator values.
 Please enter valid numerical data using the format [a,b,c].""")
+      return
 
    try:
-      denominatorP = plantDen.get()
-      denP = conversion(denominatorP)
+      denP = sim.conversion(plantDen.get())
       A = co.tf(numP,denP)
    except ValueError:
       pdenEntry.focus()
       tkinter.messagebox.showerror('Value Error', """VALUE ERROR: Invalid P(s) denominator values.
 Please enter valid numerical data using the format [a,b,c].""")
+      return
    
    try:
       dT = deadTime.get()
       L = float(dT)
-      numPade,denPade = co.pade(L,n=padeVal.get())
-      Pade = co.tf(numPade,denPade)
-      P = A*Pade
    except tkinter.TclError:
       plantDelay.focus()
       tkinter.messagebox.showerror('Value Error', """VALUE ERROR: Invalid dead time value.
 Please enter valid numerical data.""")
+      return
    eqP.set(str(A))
    if L == 0: exp.set('*e^0')
    else: exp.set('*e^-({} s)'.format(dT))
-   
-   if mode == 'process':
-      try:
-         lab = 'Process'
-         if In == 'step':
-            tP,yP,inP = response(P,magStep,timeIn,t,In)
-            indexes('P',In,inP,yP,tP,0)
-            graph(lab,inP,tP,yP)
-         elif In == 'ramp':
-            tP,yP,inP = response(P,magRamp,timeIn,t,In)
-            indexes('P',In,inP,yP,tP,0)
-            graph(lab,inP,tP,yP)
-         ending = '------------------------------'
-      except ValueError:
-      # Add context to error eg. Numerator degree greater than denominator degree
-         tkinter.messagebox.showerror('Simulation Error', """SIMULATION ERROR: A non-proper transfer function.
-has been entered.""")
-   else:
-      # Controller data.
+
+   # Controller data.
+   numC = denC = None
+   if mode != 'process':
       try:
-         numeratorC = contNum.get()
-         numC = conversion(numeratorC)
+         numC = sim.conversion(contNum.get())
       except ValueError:
          cnumEntry.focus()
          tkinter.messagebox.showerror('Value Error', """VALUE ERROR: Invalid C(s) numerator values.
 Please enter valid numerical data using the format [a,b,c].""")
+         return
       
       try:   
-         denominatorC = contDen.get()
-         denC = conversion(denominatorC)
+         denC = sim.conversion(contDen.get())
          C = co.tf(numC,denC)
       except ValueError:
          cdenEntry.focus()
          tkinter.messagebox.showerror('Value Error', """VALUE ERROR: Invalid C(s) denominator values.
 Please enter valid numerical data using the format [a,b,c].""") 
+         return
       eqC.set(str(C))
 
-      # Calculated transfer functions.
-      MYR = (C*P)/(1+C*P)
-      MYD = P/(1+C*P)
-      S = 1/(1+C*P)
-      UR = C/(1+C*P)
-      UD = (-C*P)/(1+C*P)
-      # System response and performance indexes computation.
-      try:
-         if mode == 'servo':
-            lab = 'servo'
-            if In == 'step':
-               tServo,yServo,inServo = response(MYR,magStep,timeIn,t,In)
-               tUR,yUR,inUR = response(UR,magStep,timeIn,t,In)
-               tP,yP,inP = response(P,magStep,timeIn,t,In)
-               indexes('P',In,inP,yP,tP,0)
-               indexes('MYR',In,inServo,yServo,tServo,yUR)
-               graph(lab,inServo,tServo,yServo,tUR,yUR,tP,yP)
-            elif In == 'ramp':
-               tServo,yServo,inServo = response(MYR,magRamp,timeIn,t,In)
-               tUR,yUR,inUR = response(UR,magRamp,timeIn,t,In)
-               tP,yP,inP = response(P,magRamp,timeIn,t,In)
-               indexes('P',In,inP,yP,tP,0)
-               indexes('MYR',In,inServo,yServo,tServo,yUR)
-               graph(lab,inServo,tServo,yServo,tUR,yUR,tP,yP)
-         elif mode == 'reg':
-            lab = 'reg'
-            if In == 'step':
-               tReg,yReg,inReg = response(MYD,magStep,timeIn,t,In)
-               tUD,yUD,inUD = response(UD,magStep,timeIn,t,In)
-               tP,yP,inP = response(P,magStep,timeIn,t,In)
-               indexes('P',In,inP,yP,tP,0)
-               indexes('MYD',In,inReg,yReg,tReg,yUD)
-               graph(lab,inReg,tReg,yReg,tUD,yUD,tP,yP)
-            elif In == 'ramp':
-               tReg,yReg,inReg = response(MYD,magRamp,timeIn,t,In)
-               tUD,yUD,inUD = response(UD,magRamp,timeIn,t,In)
-               tP,yP,inP = response(P,magRamp,timeIn,t,In)
-               indexes('P',In,inP,yP,tP,0)
-               indexes('MYD',In,inReg,yReg,tReg,yUD)
-               graph(lab,inReg,tReg,yReg,tUD,yUD,tP,yP)
-         elif mode == 'both':
-            lab = 'both'
-            if In == 'step':
-               tServo,yServo,inServo = response(MYR,magStep,timeIn,t,In)
-               tUR,yUR,inUR = response(UR,magStep,timeIn,t,In)
-               tReg,yReg,inReg = response(MYD,magStep,timeIn,t,In)
-               tUD,yUD,inUD = response(UD,magStep,timeIn,t,In)
-               indexes('MYR',In,inServo,yServo,tServo,yUR)
-               indexes('MYD',In,inReg,yReg,tReg,yUD)
-               graph(lab,inServo,tServo,yServo,tUR,yUR,tReg,yReg,tUD,yUD)
-            elif In == 'ramp':
-               tServo,yServo,inServo = response(MYR,magRamp,timeIn,t,In)
-               tUR,yUR,inUR = response(UR,magRamp,timeIn,t,In)
-               tReg,yReg,inReg = response(MYD,magRamp,timeIn,t,In)
-               tUD,yUD,inUD = response(UD,magRamp,timeIn,t,In)
-               indexes('MYR',In,inServo,yServo,tServo,yUR)
-               indexes('MYD',In,inReg,yReg,tReg,yUD)
-               graph(lab,inServo,tServo,yServo,tUR,yUR,tReg,yReg,tUD,yUD)
-      except ValueError:
-      # Add context to error eg. Numerator degree greater than denominator degree
-         tkinter.messagebox.showerror('Simulation Error', """SIMULATION ERROR: A non-proper transfer function.
-has been entered.""")
-      # Closed Loop maximum sensitivity Ms.
-      m,p,w = co.bode_plot(S,plot=False)  # This bode function is used to obtain the magnitude of S.
-      Ms = max(m)  # Ms is the maximum value of the magnitude array.
-      Ms = round(Ms,7)
-      ending = """
-MAXIMUM SENSITIVITY
-Ms = {}
-------------------------------
-""".format(Ms)
-   param.configure(state='normal')
-   param.insert(tk.END,ending)
-   param.see('end')
-   param.configure(state='disabled')
+   # System response and performance indexes computation.
+   record.add('conversion',sp.perf_counter()-start)
+   runInBackground(False,mode,In,"""SIMULATION ERROR: A non-proper transfer function.
+has been entered.""",record,numP,denP,L,padeMode(),mode,In,magnitude,timeIn,time,numC,denC,engine=engineMode(False),
+                   metrics=metricsMode(),**grid)
+
+def realtimeRun():
+   # Single realtime simulation using the slider values.
+   # Returns: None
+   # GUI settings.
+   runButton.focus()
+   record = Timing.Record()
+   start = sp.perf_counter()
+
+   data = readSimulationData()
+   grid = readGridSettings() if data is not None else None
+   if grid is None: return
+   time,magnitude,timeIn,In,mode = data
+
+   # Process data.
+   numP,denP = sim.processPolynomials(processSelect.get(),plantPValue.get(),plantTauValue.get(),plantZetaValue.get())
+   if(processSelect.get() != "Standard"):
+      pole0 = co.tf([1],[plantZetaValue.get()*plantTauValue.get(),1])
+      pole1 = co.tf([1],[plantTauValue.get(),1])
+      eqPGain0.set(str(plantPValue.get()))
+      eqPPole0.set(str(pole0))
+      eqPPole1.set(str(pole1))
+   A = co.tf(numP,denP)
    
-   changeSimData.set(0)
-   canvas1.get_tk_widget().update_idletasks
+   try:
+      dT = plantDeadValue.get()
+      L = float(dT)
+   except tkinter.TclError:
+      plantDelay.focus()
+      tkinter.messagebox.showerror('Value Error', """VALUE ERROR: Invalid dead time value.
+Please enter valid numerical data.""")
+      return
+   eqP.set(str(A))
+   if L == 0: exp.set('*e^0')
+   else: exp.set('*e^-({} s)'.format(dT))
+
+   # Controller data.
+   numC = denC = None
+   if mode != 'process':
+      numC,denC = sim.controllerPolynomials(controllerSelect.get(),pValue.get(),iValue.get(),dValue.get(),alphaValue.get())
+      if(controllerSelect.get() == "Standard"):
+         eqC2 = co.tf([1],[iValue.get(),0])
+         eqC3 = co.tf([dValue.get(),0],[alphaValue.get()*dValue.get(),1])
+         eqC0Str.set(str(pValue.get()))
+         eqC1Str.set(str(1))
+         eqC2Str.set(str(eqC2))
+         eqC3Str.set(str(eqC3))
+      elif(controllerSelect.get() == "Parallel"):
+         eqC1 = co.tf([iValue.get()],[1,0])
+         eqC2 = co.tf([dValue.get(),0],[dValue.get()*alphaValue.get(),1])
+         eqC0Str.set(str(pValue.get()))
+         eqC1Str.set(str(eqC1))
+         eqC2Str.set(str(eqC2))
+         eqC3Str.set('')
+      elif(controllerSelect.get() == "Series"):
+         eqC1 = co.tf([iValue.get(),1],[iValue.get(),0])
+         eqC2 = co.tf([dValue.get(),1],[dValue.get()*alphaValue.get(),1])
+         eqC0Str.set(str(pValue.get()))
+         eqC1Str.set(str(eqC1))
+         eqC2Str.set(str(eqC2))
+         eqC3Str.set('')
+      eqC.set(str(co.tf(numC,denC)))
+
+   # System response and performance indexes computation.
+   record.add('conversion',sp.perf_counter()-start)
+   runInBackground(True,mode,In,"""SIMULATION ERROR: The transfer function is not proper. Is your derivative filter value 0?""",
+                   record,numP,denP,L,padeMode(),mode,In,magnitude,timeIn,time,numC,denC,engine=engineMode(True),metrics=metricsMode(),**grid)
 
 def simulatorRealtime(*args):
+    # Runs the realtime simulation. Called on RUN and, through scheduleRealtime,
+    # once per frame at most while sliders or simulation data change.
+    global realtimeJob
+    realtimeJob = None
     if realtimeExecute.get() == 1:
-        if changeP.get() == 1 or changeI.get() == 1 or changeD.get() == 1 or changeSlide.get() == 1 or changeContPlant.get() == 1 or changeContType.get() == 1 or changeSimData.get() == 1:
-           # GUI settings.
-           runButton.focus()
-           now = datetime.now()
-           dt_string = now.strftime("%d/%m/%Y %H:%M:%S")  # dd/mm/YY H:M:S
-           param.configure(state='normal')
-           #param.insert(tk.END,'\n'+dt_string)
-           param.delete('1.0', tk.END)
-           param.insert('1.0', dt_string)
-           param.configure(state='disabled')
-           ax1.clear();ax2.clear();ax3.clear();ax4.clear()
-           buttonNW.pack_forget();buttonNE.pack_forget()
-           buttonSW.pack_forget();buttonSE.pack_forget()
-           canvas1.get_tk_widget().pack_forget();canvas2.get_tk_widget().pack_forget()
-           canvas3.get_tk_widget().pack_forget();canvas4.get_tk_widget().pack_forget()
-
-           # Simulation time.
-           try:
-              time = simTime.get()
-              t = np.linspace(0,time,5001)
-           except tkinter.TclError:
-              timeEntry.focus()
-              tkinter.messagebox.showerror('Value Error', """VALUE ERROR: Invalid simulation time value.
-        Please enter valid numerical data.""")
-           
-           # Step magnitude.
-           try:
-              magStep = magS.get()
-           except tkinter.TclError:
-              stepEntry.focus()
-              tkinter.messagebox.showerror('Value Error', """VALUE ERROR: Invalid step input value.
-        Please enter valid numerical data.""")
-           
-           # Ramp magnitude.
-           try:
-              magRamp = magR.get()
-           except tkinter.TclError:
-              rampEntry.focus()
-              tkinter.messagebox.showerror('Value Error', """VALUE ERROR: Invalid ramp slope value.
-        Please enter valid numerical data.""")
-           
-           # Input time.
-           try:
-              timeIn = inTime.get()
-           except tkinter.TclError:
-              tinEntry.focus()
-              tkinter.messagebox.showerror('Value Error', """VALUE ERROR: Invalid input time value.
-        Please enter valid numerical data.""")
-
-           # Input selection.
-           state = check.get()
-           if state == 1: In = 'step'
-           else: In = 'ramp'
-
-           # Control mode selection.
-           transfer = graphics.get()
-           if transfer == 1: mode = 'servo'
-           elif transfer == 2: mode = 'reg'
-           elif transfer == 3: mode = 'both'
-           else: mode = 'process'
-
-           # Process data.
-           try:
-              if(processSelect.get() == "Standard"):
-                numeratorP = [plantPValue.get()*(plantTauValue.get()**2)]
-              else:
-                numeratorP = [plantPValue.get()]
-              numP = [float(x) for x in numeratorP]
-           except ValueError:
-              pnumEntry.focus()
-              tkinter.messagebox.showerror('Value Error', """VALUE ERROR: Invalid P(s) numerator values.
-        Please enter valid numerical data using the format [a,b,c].""")
-
-           try:
-              if(processSelect.get() == "Standard"):
-                denominatorP = [1,(2*plantTauValue.get()*plantZetaValue.get()),plantTauValue.get()**2]
-              else:
-                denominatorP = [plantZetaValue.get()*plantTauValue.get()**2,plantTauValue.get()*(plantZetaValue.get()+1),1]
-                pole0 = co.tf([1],[plantZetaValue.get()*plantTauValue.get(),1])
-                pole1 = co.tf([1],[plantTauValue.get(),1])
-                eqPGain0.set(str(plantPValue.get()))
-                eqPPole0.set(str(pole0))
-                eqPPole1.set(str(pole1))
-              denP = [float(x) for x in denominatorP]
-              A = co.tf(numP,denP)
-           except ValueError:
-              pdenEntry.focus()
-              tkinter.messagebox.showerror('Value Error', """VALUE ERROR: Invalid P(s) denominator values.
-        Please enter valid numerical data using the format [a,b,c].""")
-           
-           try:
-              dT = plantDeadValue.get()
-              L = float(dT)
-              numPade,denPade = co.pade(L,n=padeVal.get())
-              Pade = co.tf(numPade,denPade)
-              P = A*Pade
-           except tkinter.TclError:
-              plantDelay.focus()
-              tkinter.messagebox.showerror('Value Error', """VALUE ERROR: Invalid dead time value.
-        Please enter valid numerical data.""")
-           eqP.set(str(A))
-           if L == 0: exp.set('*e^0')
-           else: exp.set('*e^-({} s)'.format(dT))
-           
-           if mode == 'process':
-              try:
-                  lab = 'Process'
-                  if In == 'step':
-                     tP,yP,inP = response(P,magStep,timeIn,t,In)
-                     indexes('P',In,inP,yP,tP,0)
-                     graph(lab,inP,tP,yP)
-                  elif In == 'ramp':
-                     tP,yP,inP = response(P,magRamp,timeIn,t,In)
-                     indexes('P',In,inP,yP,tP,0)
-                     graph(lab,inP,tP,yP)
-                  ending = '------------------------------'
-              except ValueError:
-      # Add context to error eg. Numerator degree greater than denominator degree
-                  tkinter.messagebox.showerror('Simulation Error', """SIMULATION ERROR: A non-proper transfer function.
-has been entered.""")
-           
-           else:
-              # Controller data.
-              try:
-                 if(controllerSelect.get() == "Standard"):
-                    numeratorC = [((alphaValue.get()+1)*pValue.get()*dValue.get()*iValue.get()),pValue.get()*((alphaValue.get()*dValue.get()+iValue.get())),pValue.get()]
-                 elif(controllerSelect.get() == "Parallel"):
-                    numeratorC = [dValue.get()*(alphaValue.get()*pValue.get()+1), pValue.get()+(alphaValue.get()*iValue.get()*dValue.get()), iValue.get()]
-                 elif(controllerSelect.get() == "Series"):
-                    numeratorC = [pValue.get()*iValue.get()*dValue.get(), iValue.get()+dValue.get(), pValue.get()]
-                 numC = [float(x) for x in numeratorC]
-              except ValueError:
-                 cnumEntry.focus()
-                 tkinter.messagebox.showerror('Value Error', """VALUE ERROR: Invalid C(s) numerator values.
-        Please enter valid numerical data using the format [a,b,c].""")
-              
-              try:
-                 if(controllerSelect.get() == "Standard"):
-                    denC = [(alphaValue.get()*dValue.get()*iValue.get()),iValue.get(),0]
-                    eqC2 = co.tf([1],[iValue.get(),0])
-                    eqC3 = co.tf([dValue.get(),0],[alphaValue.get()*dValue.get(),1])
-                    eqC0Str.set(str(pValue.get()))
-                    eqC1Str.set(str(1))
-                    eqC2Str.set(str(eqC2))
-                    eqC3Str.set(str(eqC3))
-                 elif(controllerSelect.get() == "Parallel"):
-                    denC = [alphaValue.get()*dValue.get(),1,0]
-                    eqC1 = co.tf([iValue.get()],[1,0])
-                    eqC2 = co.tf([dValue.get(),0],[dValue.get()*alphaValue.get(),1])
-                    eqC0Str.set(str(pValue.get()))
-                    eqC1Str.set(str(eqC1))
-                    eqC2Str.set(str(eqC2))
-                    eqC3Str.set('')
-                 elif(controllerSelect.get() == "Series"):
-                    denC = [alphaValue.get()*iValue.get()*dValue.get(), iValue.get(), 0]
-                    eqC1 = co.tf([iValue.get(),1],[iValue.get(),0])
-                    eqC2 = co.tf([dValue.get(),1],[dValue.get()*alphaValue.get(),1])
-                    eqC0Str.set(str(pValue.get()))
-                    eqC1Str.set(str(eqC1))
-                    eqC2Str.set(str(eqC2))
-                    eqC3Str.set('')
-                 C = co.tf(numC,denC)
-              except ValueError:
-                 cdenEntry.focus()
-                 tkinter.messagebox.showerror('Value Error', """VALUE ERROR: Invalid C(s) denominator values.
-        Please enter valid numerical data using the format [a,b,c].""")
-              eqC.set(str(C))
-              # Calculated transfer functions.
-              MYR = (C*P)/(1+C*P)
-              MYD = P/(1+C*P)
-              S = 1/(1+C*P)
-              UR = C/(1+C*P)
-              UD = (-C*P)/(1+C*P)
-
-              # System response and performance indexes computation.
-              try:
-                 if mode == 'servo':
-                    lab = 'servo'
-                    if In == 'step':
-                       tP,yP,inP = response(P,magStep,timeIn,t,In)
-                       tServo,yServo,inServo = response(MYR,magStep,timeIn,t,In)
-                       tUR,yUR,inUR = response(UR,magStep,timeIn,t,In)
-                       indexes('P',In,inP,yP,tP,0)
-                       indexes('MYR',In,inServo,yServo,tServo,yUR)
-                       graph(lab,inServo,tServo,yServo,tUR,yUR,tP,yP)
-                    elif In == 'ramp':
-                       tP,yP,inP = response(P,magRamp,timeIn,t,In)
-                       tServo,yServo,inServo = response(MYR,magRamp,timeIn,t,In)
-                       tUR,yUR,inUR = response(UR,magRamp,timeIn,t,In)
-                       indexes('P',In,inP,yP,tP,0)
-                       indexes('MYR',In,inServo,yServo,tServo,yUR)
-                       graph(lab,inServo,tServo,yServo,tUR,yUR,tP,yP)
-                 elif mode == 'reg':
-                    lab = 'reg'
-                    if In == 'step':
-                       tP,yP,inP = response(P,magStep,timeIn,t,In)
-                       tReg,yReg,inReg = response(MYD,magStep,timeIn,t,In)
-                       tUD,yUD,inUD = response(UD,magStep,timeIn,t,In)
-                       indexes('P',In,inP,yP,tP,0)
-                       indexes('MYD',In,inReg,yReg,tReg,yUD)
-                       graph(lab,inReg,tReg,yReg,tUD,yUD,tP,yP)
-                    elif In == 'ramp':
-                       tP,yP,inP = response(P,magRamp,timeIn,t,In)
-                       tReg,yReg,inReg = response(MYD,magRamp,timeIn,t,In)
-                       tUD,yUD,inUD = response(UD,magRamp,timeIn,t,In)
-                       indexes('P',In,inP,yP,tP,0)
-                       indexes('MYD',In,inReg,yReg,tReg,yUD)
-                       graph(lab,inReg,tReg,yReg,tUD,yUD,tP,yP)
-                 elif mode == 'both':
-                    lab = 'both'
-                    if In == 'step':
-                       tServo,yServo,inServo = response(MYR,magStep,timeIn,t,In)
-                       tUR,yUR,inUR = response(UR,magStep,timeIn,t,In)
-                       tReg,yReg,inReg = response(MYD,magStep,timeIn,t,In)
-                       tUD,yUD,inUD = response(UD,magStep,timeIn,t,In)
-                       indexes('MYR',In,inServo,yServo,tServo,yUR)
-                       indexes('MYD',In,inReg,yReg,tReg,yUD)
-                       graph(lab,inServo,tServo,yServo,tUR,yUR,tReg,yReg,tUD,yUD)
-                    elif In == 'ramp':
-                       tServo,yServo,inServo = response(MYR,magRamp,timeIn,t,In)
-                       tUR,yUR,inUR = response(UR,magRamp,timeIn,t,In)
-                       tReg,yReg,inReg = response(MYD,magRamp,timeIn,t,In)
-                       tUD,yUD,inUD = response(UD,magRamp,timeIn,t,In)
-                       indexes('MYR',In,inServo,yServo,tServo,yUR)
-                       indexes('MYD',In,inReg,yReg,tReg,yUD)
-                       graph(lab,inServo,tServo,yServo,tUR,yUR,tReg,yReg,tUD,yUD)
-              except ValueError:
-              # Add context to error eg. Numerator degree greater than denominator degree
-                 tkinter.messagebox.showerror('Simulation Error', """SIMULATION ERROR: The transfer function is not proper. Is your derivative filter value 0?""")
-              # Closed Loop maximum sensitivity Ms.
-              m,p,w = co.bode_plot(S,plot=False)  # This bode function is used to obtain the magnitude of S.
-              Ms = max(m)  # Ms is the maximum value of the magnitude array.
-              Ms = round(Ms,7)
-              ending = """
-        MAXIMUM SENSITIVITY
-        Ms = {}
-        ------------------------------
-        """.format(Ms)
-           param.configure(state='normal')
-           param.insert(tk.END,ending)
-           param.see('end')
-           param.configure(state='disabled')
-
-    changeP.set(0)
-    changeI.set(0)
-    changeD.set(0)
-    changeSlide.set(0)
-    changeContPlant.set(0)
-    changeContType.set(0)
-    changeSimData.set(0)
-    
-    canvas1.get_tk_widget().update_idletasks   
-    canvas2.get_tk_widget().update_idletasks
-    canvas3.get_tk_widget().update_idletasks   
-    canvas4.get_tk_widget().update_idletasks 
-    mainWindow.after(1, simulatorRealtime)
+        realtimeRun()
     
 
 #################################################
@@ -1556,6 +1397,7 @@ menubar = tk.Menu(mainWindow)
 systemenu = tk.Menu(menubar,tearoff=0)
 systemenu.add_command(label='Run',command=simulator,accelerator="F5")
 systemenu.add_command(label='Reset all values',command=masterReset,accelerator="Ctrl+L")
+systemenu.add_checkbutton(label='Log stage times',variable=logTimings,command=lambda: Timing.enableLogging(logTimings.get() == 1))
 systemenu.add_separator()
 systemenu.add_command(label='Exit',command=close,accelerator="Alt+F4")
 menubar.add_cascade(label='Simulation',menu=systemenu)
@@ -1594,6 +1436,11 @@ sectorF = ttk.LabelFrame(mainWindow,text='2.Slider Adjustment')
 #sectorF.place(x=263,y=5,width=412,height=260)
 sectorF.grid(column=1, sticky="NSEW", row=0)
 
+# Realtime status bar, hidden until enabled in sector C.
+statusBar = tk.Label(mainWindow,textvariable=statusText,anchor=tk.W,relief=tk.SUNKEN,bd=1)
+statusBar.grid(column=0, sticky="EW", row=2, columnspan=3)
+statusBar.grid_remove()
+
 # Font Control
 Desired_font = tkinter.font.Font(size = 9, weight = "bold")
 buttonFont = tkinter.font.Font(size = 9, weight = "bold")
@@ -1648,6 +1495,10 @@ cdenEntry = tk.Entry(sectorA,textvariable=contDen)
 cdenEntry.grid(row=3,column=4)
 padeEntry = tk.Entry(sectorA,textvariable=padeVal,width=10)
 padeEntry.grid(row=12,column=5, pady=5)
+exactOption = tk.Checkbutton(sectorA, text='Exact dead time',variable=exactDeadTime,command=deadTimeChange)
+exactOption.grid(row=13,column=5,sticky='w')
+autoPadeOption = tk.Checkbutton(sectorA, text='Auto Pade degree',variable=autoPade,command=deadTimeChange)
+autoPadeOption.grid(row=14,column=5,sticky='w')
 
 # Sliders
 if(scalingFactor < 1.28):
@@ -1775,9 +1626,20 @@ discreteOption.select()
 realtimeOption = tk.Radiobutton(sectorB, text='Realtime',variable=checkType,value=2)
 realtimeOption.grid(row=7,column=2,padx=5,sticky='e')
 
+# Time grid.
+tk.Label(sectorB,text='Time grid:').grid(row=8,column=1,padx=10,sticky=tk.W)
+adaptiveOption = tk.Checkbutton(sectorB, text='Adaptive',variable=adaptiveGrid,command=simDataChange)
+adaptiveOption.grid(row=8,column=2,sticky='w')
+tk.Label(sectorB,text='Grid tolerance:').grid(row=9,column=1,padx=10,sticky=tk.W)
+toleranceEntry = tk.Entry(sectorB,textvariable=gridTolerance)
+toleranceEntry.grid(row=9,column=2,pady=5)
+tk.Label(sectorB,text='Indexes:').grid(row=10,column=1,padx=10,sticky=tk.W)
+analyticOption = tk.Checkbutton(sectorB, text='Analytic ISE',variable=analyticMetrics,command=simDataChange)
+analyticOption.grid(row=10,column=2,sticky='w')
+
 # Buttons.
 inputResetButton = tk.Button(sectorB,text='Reset Values',bg='#829ce3',command=resetInputs, font = buttonFont)
-inputResetButton.grid(row=8,column=1,columnspan=2,pady=9)
+inputResetButton.grid(row=11,column=1,columnspan=2,pady=9)
 
 # Sector C widgets.
 # Radiobuttons.
@@ -1797,6 +1659,21 @@ runButton = tk.Button(sectorC,text='RUN', bg='#7aff70', width=10, command=checkR
 runButton.grid(row=5,column=2,padx=10,ipady=5)
 stopButton = tk.Button(sectorC,text='STOP', bg='#ff7070', width=10, command=stopRealtime, font = buttonFont)
 stopButton.grid(row=6,column=2,padx=10,ipady=5)
+tuneButton = tk.Button(sectorC,text='AUTO-TUNE', bg='#fff15c', width=10, command=autoTune, font = buttonFont)
+tuneButton.grid(row=6,column=1,padx=10,ipady=5)
+# Auto-tune options.
+tk.Label(sectorC,text='Tune index:').grid(row=7,column=1,padx=10,sticky=tk.W)
+tuneIndexSelect = ttk.OptionMenu(sectorC, tuneIndex, 'IAE', 'IAE', 'ISE', 'ITAE')
+tuneIndexSelect.grid(row=7,column=2,pady=5)
+tk.Label(sectorC,text='Max TVu:').grid(row=8,column=1,padx=10,sticky=tk.W)
+maxTVEntry = tk.Entry(sectorC,textvariable=tuneMaxTV,width=10)
+maxTVEntry.grid(row=8,column=2,pady=5)
+exportButton = tk.Button(sectorC,text='EXPORT', bg='#829ce3', width=10, command=exportResults, font = buttonFont)
+exportButton.grid(row=9,column=1,columnspan=2,pady=5,ipady=5)
+timingsOption = tk.Checkbutton(sectorC, text='Show stage timings',variable=showTimings)
+timingsOption.grid(row=10,column=1,columnspan=2,pady=5)
+statusOption = tk.Checkbutton(sectorC, text='Show realtime status',variable=showStatus,command=toggleStatus)
+statusOption.grid(row=11,column=1,columnspan=2,pady=5)
 
 # Sector D widgets.
 # Scrollbars.
@@ -1822,52 +1699,58 @@ buttonNW = tk.Button(master=frameNW,text='View',command=figViewNW)
 buttonNE = tk.Button(master=frameNE, text='View',command=figViewNE)
 buttonSW = tk.Button(master=frameSW, text='View',command=figViewSW)
 buttonSE = tk.Button(master=frameSE, text='View',command=figViewSE)
-# Figures.
-fig1 = Figure(figsize=(5,5),dpi=100)
-fig1, ax1 = plt.subplots()
-fig2 = Figure(figsize=(5,5),dpi=100)
-fig2, ax2 = plt.subplots()
-fig3 = Figure(figsize=(5,5),dpi=100)
-fig3, ax3 = plt.subplots()
-fig4 = Figure(figsize=(5,5),dpi=100)
-fig4, ax4 = plt.subplots()
-fig1.set_tight_layout(True)
-fig2.set_tight_layout(True)
-fig3.set_tight_layout(True)
-fig4.set_tight_layout(True)
-# FigureCanvas.
-if(scalingFactor < 1.28):
-    canvas1 = FigureCanvasTkAgg(fig1,master=frameNW)
-    canvas1.get_tk_widget().config(width=scalingFactor*350*0.7,height=scalingFactor*310*0.7)
-    canvas2 = FigureCanvasTkAgg(fig2,master=frameNE)
-    canvas2.get_tk_widget().config(width=scalingFactor*350*0.7,height=scalingFactor*310*0.7)
-    canvas3 = FigureCanvasTkAgg(fig3,master=frameSW)
-    canvas3.get_tk_widget().config(width=scalingFactor*350*0.7,height=scalingFactor*310*0.7)
-    canvas4 = FigureCanvasTkAgg(fig4,master=frameSE)
-    canvas4.get_tk_widget().config(width=scalingFactor*350*0.7,height=scalingFactor*310*0.7)
-else:
-    canvas1 = FigureCanvasTkAgg(fig1,master=frameNW)
-    canvas1.get_tk_widget().config(width=330,height=310)
-    canvas2 = FigureCanvasTkAgg(fig2,master=frameNE)
-    canvas2.get_tk_widget().config(width=330,height=310)
-    canvas3 = FigureCanvasTkAgg(fig3,master=frameSW)
-    canvas3.get_tk_widget().config(width=330,height=310)
-    canvas4 = FigureCanvasTkAgg(fig4,master=frameSE)
-    canvas4.get_tk_widget().config(width=330,height=310)
-
-# Pop-up window Figures.
-figI = Figure(figsize=(5,5),dpi=100)
-figI, axI = plt.subplots()
-axI.set_xlabel('Time (s)');axI.set_ylabel('Amplitude')
-figII = Figure(figsize=(5,5),dpi=100)
-figII, axII = plt.subplots()
-axII.set_xlabel('Time (s)');axII.set_ylabel('Amplitude')
-figIII = Figure(figsize=(5,5),dpi=100)
-figIII, axIII = plt.subplots()
-axIII.set_xlabel('Time (s)');axIII.set_ylabel('Amplitude')
-figIV = Figure(figsize=(5,5),dpi=100)
-figIV, axIV = plt.subplots()
-axIV.set_xlabel('Time (s)');axIV.set_ylabel('Amplitude')
+# Figures, built by buildPlots once the window is shown.
+panel1 = panel2 = panel3 = panel4 = None
+
+def buildPlots():
+   # Creates the Simulation Results figures, canvases and plot panels and the
+   # pop-up figures. Called after the window first appears, so loading
+   # matplotlib does not delay it, and before any plotting in case a
+   # simulation finishes first.
+   # Returns: None
+   global fig1,fig2,fig3,fig4,ax1,ax2,ax3,ax4,canvas1,canvas2,canvas3,canvas4
+   global panel1,panel2,panel3,panel4,figI,figII,figIII,figIV,axI,axII,axIII,axIV,plotI,plotII,plotIII,plotIV
+   if panel1 is not None: return
+   if(scalingFactor < 1.28):
+      matplotlib.rcParams.update({'font.size': 7})
+   fig1 = mplFigure.Figure(figsize=(5,5),dpi=100);ax1 = fig1.add_subplot(111)
+   fig2 = mplFigure.Figure(figsize=(5,5),dpi=100);ax2 = fig2.add_subplot(111)
+   fig3 = mplFigure.Figure(figsize=(5,5),dpi=100);ax3 = fig3.add_subplot(111)
+   fig4 = mplFigure.Figure(figsize=(5,5),dpi=100);ax4 = fig4.add_subplot(111)
+   fig1.set_tight_layout(True)
+   fig2.set_tight_layout(True)
+   fig3.set_tight_layout(True)
+   fig4.set_tight_layout(True)
+   # FigureCanvas.
+   if(scalingFactor < 1.28):
+      canvasWidth,canvasHeight = scalingFactor*350*0.7,scalingFactor*310*0.7
+   else:
+      canvasWidth,canvasHeight = 330,310
+   canvas1 = backendTk.FigureCanvasTkAgg(fig1,master=frameNW)
+   canvas1.get_tk_widget().config(width=canvasWidth,height=canvasHeight)
+   canvas2 = backendTk.FigureCanvasTkAgg(fig2,master=frameNE)
+   canvas2.get_tk_widget().config(width=canvasWidth,height=canvasHeight)
+   canvas3 = backendTk.FigureCanvasTkAgg(fig3,master=frameSW)
+   canvas3.get_tk_widget().config(width=canvasWidth,height=canvasHeight)
+   canvas4 = backendTk.FigureCanvasTkAgg(fig4,master=frameSE)
+   canvas4.get_tk_widget().config(width=canvasWidth,height=canvasHeight)
+   # Plot panels.
+   plotFontSize = 7 if scalingFactor < 1.28 else None
+   panel1 = PlotPanel(canvas1,ax1,buttonNW,plotFontSize)
+   panel2 = PlotPanel(canvas2,ax2,buttonNE,plotFontSize)
+   panel3 = PlotPanel(canvas3,ax3,buttonSW,plotFontSize)
+   panel4 = PlotPanel(canvas4,ax4,buttonSE,plotFontSize)
+
+   # Pop-up window Figures.
+   figI = mplFigure.Figure(figsize=(5,5),dpi=100);axI = figI.add_subplot(111)
+   axI.set_xlabel('Time (s)');axI.set_ylabel('Amplitude')
+   figII = mplFigure.Figure(figsize=(5,5),dpi=100);axII = figII.add_subplot(111)
+   axII.set_xlabel('Time (s)');axII.set_ylabel('Amplitude')
+   figIII = mplFigure.Figure(figsize=(5,5),dpi=100);axIII = figIII.add_subplot(111)
+   axIII.set_xlabel('Time (s)');axIII.set_ylabel('Amplitude')
+   figIV = mplFigure.Figure(figsize=(5,5),dpi=100);axIV = figIV.add_subplot(111)
+   axIV.set_xlabel('Time (s)');axIV.set_ylabel('Amplitude')
+   plotI = Decimator(axI);plotII = Decimator(axII);plotIII = Decimator(axIII);plotIV = Decimator(axIV)
 
 # Sector F widgets.
 # Entries
@@ -1951,6 +1834,7 @@ timeEntry.bind("<Return>", simDataChange)
 tinEntry.bind("<Return>", simDataChange)
 stepEntry.bind("<Return>", simDataChange)
 rampEntry.bind("<Return>", simDataChange)
+toleranceEntry.bind("<Return>", simDataChange)
 timeBind = timeEntry.bind("<FocusIn>",timeHintText)
 tinBind = tinEntry.bind("<FocusIn>",intimeHintText)
 stepBind = stepEntry.bind("<FocusIn>",stepHintText)
@@ -1988,9 +1872,15 @@ contIOption.configure(state= 'disabled')
 contDOption.configure(state= 'disabled')
 loadRangeButton.configure(state= 'disabled')
 loadValueButton.configure(state= 'disabled')
+tuneButton.configure(state= 'disabled')
 discreteOption.bind("<Button-1>",discreteOptionLock)
 realtimeOption.bind("<Button-1>",realtimeOptionLock)
 
 
 mainWindow.config(menu=menubar)
+# Fast start: show the window, then build the plots and load the simulation
+# modules in the background while the user enters data.
+mainWindow.update()
+Lazy.preload('control','Simulation','Tuner','Export')
+mainWindow.after_idle(buildPlots)
 mainWindow.mainloop()
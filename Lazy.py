@@ -0,0 +1,51 @@
+###########################################################
+#######           CONTROL SYSTEMS SIMULATOR         #######
+#######              LAZY IMPORTS                   #######
+###########################################################
+
+# Deferred imports for a fast start. module() returns a stand-in that imports
+# the real module on its first attribute access, so the GUI can be built and
+# shown before control, scipy and matplotlib are loaded. preload() imports
+# modules in a background thread once the window is up; a later first use
+# finds them in sys.modules, or waits for the import in progress.
+
+# Libraries.
+import importlib
+import threading
+
+class LazyModule:
+   # Stand-in for a module that is imported on first attribute access.
+
+   def __init__(self,name):
+      self.moduleName = name
+      self.module = None
+
+   def __getattr__(self,attribute):
+      # Only called for attributes the stand-in does not have itself.
+      if self.module is None:
+         self.module = importlib.import_module(self.moduleName)
+      return getattr(self.module,attribute)
+
+   def __repr__(self):
+      return '<lazy module {}{}>'.format(self.moduleName,'' if self.module is None else ' (loaded)')
+
+def module(name):
+   # Returns: stand-in for the module name, imported on first use.
+   return LazyModule(name)
+
+def importAll(names):
+   # Imports the modules in order. A module that fails to import is left for
+   # its first use to report the error.
+   # Returns: None
+   for name in names:
+      try:
+         importlib.import_module(name)
+      except ImportError:
+         pass
+
+def preload(*names):
+   # Imports the modules in a background daemon thread.
+   # Returns: the thread.
+   thread = threading.Thread(target=importAll,args=(names,),name='preload',daemon=True)
+   thread.start()
+   return thread
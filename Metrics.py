@@ -0,0 +1,63 @@
+###########################################################
+#######           CONTROL SYSTEMS SIMULATOR         #######
+#######              PERFORMANCE INDEXES            #######
+###########################################################
+
+# Single pass accumulators of the performance indexes. A response is fed in
+# consecutive chunks as it is produced and every chunk is integrated with the
+# trapezoidal rule, carrying the last sample over to the next chunk, so the
+# result equals the integral over the whole response while only chunk-sized
+# temporaries are created. The error and control signals may hold a batch of
+# responses along their leading axes, the time samples being the last axis.
+
+# Libraries.
+import numpy as np
+
+# Samples integrated at a time when the whole response is available, see
+# Simulation.performanceIndexes.
+chunkSamples = 8192
+
+class IndexAccumulator:
+   # Running IAE, ISE, ITAE and (when a control signal is given) TV.
+
+   def __init__(self):
+      self.iae = 0.
+      self.ise = 0.
+      self.itae = 0.
+      self.tv = None
+      self.last = None  # t, |e|, e^2, t*|e| and u at the last sample.
+
+   def update(self,t,error,u=None):
+      # Adds the next chunk of samples: times t, errors and control signals u.
+      # Returns: None
+      t = np.asarray(t,dtype=float)
+      if t.shape[-1] == 0:
+         return
+      error = np.asarray(error,dtype=float)
+      absError = np.abs(error)
+      sqError = error*error
+      timeAbsError = absError*t
+      dt = np.diff(t)
+      self.iae = self.iae + np.sum((absError[...,1:]+absError[...,:-1])*dt,axis=-1)/2
+      self.ise = self.ise + np.sum((sqError[...,1:]+sqError[...,:-1])*dt,axis=-1)/2
+      self.itae = self.itae + np.sum((timeAbsError[...,1:]+timeAbsError[...,:-1])*dt,axis=-1)/2
+      if self.last is not None:
+         tPrev,absPrev,sqPrev,timeAbsPrev,uPrev = self.last
+         dt0 = t[0]-tPrev
+         self.iae = self.iae + (absPrev+absError[...,0])*dt0/2
+         self.ise = self.ise + (sqPrev+sqError[...,0])*dt0/2
+         self.itae = self.itae + (timeAbsPrev+timeAbsError[...,0])*dt0/2
+      if u is not None:
+         u = np.asarray(u,dtype=float)
+         tv = np.sum(np.abs(np.diff(u,axis=-1)),axis=-1)
+         if self.last is not None and self.last[4] is not None:
+            tv = tv + np.abs(u[...,0]-self.last[4])
+         self.tv = tv if self.tv is None else self.tv+tv
+      # Copies, since the chunks may be views of a buffer that is reused.
+      self.last = (float(t[-1]),absError[...,-1].copy(),sqError[...,-1].copy(),timeAbsError[...,-1].copy(),
+                   None if u is None else u[...,-1].copy())
+
+   def result(self):
+      # Returns: dictionary with the IAE, ISE, ITAE and TV values (TV is None
+      #          if no control signal was given).
+      return {'IAE': self.iae,'ISE': self.ise,'ITAE': self.itae,'TV': self.tv}
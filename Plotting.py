@@ -0,0 +1,199 @@
+###########################################################
+#######           CONTROL SYSTEMS SIMULATOR         #######
+#######              PLOTTING                       #######
+###########################################################
+
+# Incremental plotting for the Simulation Results canvases. Each panel creates
+# its input and output lines once and afterwards only replaces their data. When
+# the axes limits, labels and title stay the same, the panel restores the saved
+# background and blits the redrawn lines instead of redrawing the whole figure.
+# Series are min-max decimated to about two samples per pixel of the axes width
+# before plotting, which keeps every peak and overshoot while the rendering
+# cost no longer depends on the number of simulated samples. Decimator does the
+# same for ordinary axes, decimating again when a toolbar zoom or pan changes
+# the visible range.
+
+# Libraries.
+import numpy as np
+
+def minMax(t,y,buckets,xlim=None):
+   # Min-max decimation: splits the samples within xlim (all if None, plus one
+   # sample beyond each side) into buckets of consecutive samples and keeps
+   # the minimum and maximum of every bucket and the end samples, in time
+   # order. Short series are returned unchanged. t must be increasing.
+   # Returns: (t,y) decimated.
+   t = np.asarray(t,dtype=float);y = np.asarray(y,dtype=float)
+   start,stop = 0,len(t)
+   if xlim is not None:
+      start = max(int(np.searchsorted(t,xlim[0]))-1,0)
+      stop = min(int(np.searchsorted(t,xlim[1],side='right'))+1,len(t))
+   n = stop-start
+   buckets = max(int(buckets),1)
+   if n <= 4*buckets:
+      return t[start:stop],y[start:stop]
+   size = -(-n//buckets)
+   rows = -(-n//size)
+   blocks = np.empty(rows*size)
+   blocks[:n] = y[start:stop]
+   blocks[n:] = y[stop-1]  # Padding, mapped back to the last sample.
+   blocks = blocks.reshape(rows,size)
+   offsets = start+np.arange(rows)*size
+   keep = np.concatenate(([start,stop-1],offsets+blocks.argmin(axis=1),offsets+blocks.argmax(axis=1)))
+   keep = np.unique(np.minimum(keep,stop-1))
+   return t[keep],y[keep]
+
+def pixels(ax):
+   # Returns: width of the axes in pixels, the number of decimation buckets.
+   return max(int(ax.bbox.width),1)
+
+class Decimator:
+   # Plots lines on an ordinary axes decimated to its width in pixels and
+   # decimates them again from the full series whenever the x limits change
+   # (toolbar zoom, pan, home, back and forward) or the canvas is resized.
+
+   def __init__(self,ax):
+      self.ax = ax
+      self.series = []  # (line,t,y) with the full series.
+      self.refreshing = False
+      self.connect()
+      ax.figure.canvas.mpl_connect('resize_event',lambda event: self.refresh())
+
+   def connect(self):
+      self.ax.callbacks.connect('xlim_changed',lambda ax: self.refresh())
+
+   def clear(self):
+      # Clears the axes, which also drops its callbacks, and the series.
+      self.ax.clear()
+      self.series = []
+      self.connect()
+
+   def plot(self,t,y,*args,**kwargs):
+      # Plots the full series like Axes.plot, so autoscaling sees all of it;
+      # call refresh() after the last line to decimate them.
+      # Returns: the Line2D.
+      line, = self.ax.plot(t,y,*args,**kwargs)
+      self.series.append((line,t,y))
+      return line
+
+   def refresh(self):
+      # Decimates every line over the visible x range.
+      # Returns: None
+      if self.refreshing or not self.series: return
+      self.refreshing = True
+      try:
+         xlim = sorted(self.ax.get_xlim())
+         buckets = pixels(self.ax)
+         for line,t,y in self.series:
+            line.set_data(*minMax(t,y,buckets,xlim))
+      finally:
+         self.refreshing = False
+
+class PlotPanel:
+   # One Simulation Results plot: an axes on a FigureCanvasTkAgg plus its
+   # "View" button.
+
+   def __init__(self,canvas,ax,button,fontsize=None):
+      self.canvas = canvas
+      self.ax = ax
+      self.button = button
+      self.fontsize = fontsize
+      self.inputLine, = ax.plot([],[],':m',animated=True)
+      self.outputLine, = ax.plot([],[],'-b',animated=True)
+      self.labels = None
+      self.title = None
+      self.units = None
+      self.background = None
+      self.visible = False
+      if fontsize is not None:
+         ax.tick_params(axis='both',which='major',labelsize=fontsize)
+      canvas.mpl_connect('draw_event',self.onDraw)
+
+   def onDraw(self,event):
+      # After every full redraw, saves the background without the lines and
+      # draws the lines on top of it.
+      self.background = self.canvas.copy_from_bbox(self.ax.bbox)
+      self.drawLines()
+
+   def drawLines(self):
+      self.ax.draw_artist(self.inputLine)
+      self.ax.draw_artist(self.outputLine)
+
+   def limits(self,t,uin,y):
+      # Computes the axes limits for the new data. The current y limits are
+      # kept while the data fits in them and uses at least half of their range,
+      # so small changes can be blitted without rescaling.
+      # Returns: (xlim,ylim).
+      xlim = (float(t[0]),float(t[-1])) if len(t) > 1 and t[-1] > t[0] else self.ax.get_xlim()
+      data = np.concatenate((np.asarray(uin,dtype=float).ravel(),np.asarray(y,dtype=float).ravel()))
+      data = data[np.isfinite(data)]
+      if len(data) == 0:
+         return xlim,self.ax.get_ylim()
+      lo = float(data.min());hi = float(data.max())
+      if self.labels is not None:
+         curLo,curHi = self.ax.get_ylim()
+         if lo >= curLo and hi <= curHi and (hi-lo) >= 0.5*(curHi-curLo):
+            return xlim,(curLo,curHi)
+      margin = 0.05*(hi-lo) if hi > lo else max(abs(hi),1.)*0.05
+      return xlim,(lo-margin,hi+margin)
+
+   def update(self,t,uin,y,inputLabel,outputLabel,title,units):
+      # Replaces the plotted data, redrawing the whole figure only when the
+      # limits, legend, title or axis labels change.
+      # Returns: None
+      full = self.background is None
+      xlim,ylim = self.limits(t,uin,y)
+      buckets = pixels(self.ax)
+      self.inputLine.set_data(*minMax(t,uin,buckets))
+      self.outputLine.set_data(*minMax(t,y,buckets))
+      if xlim != tuple(self.ax.get_xlim()) or ylim != tuple(self.ax.get_ylim()):
+         self.ax.set_xlim(xlim);self.ax.set_ylim(ylim)
+         full = True
+      if (inputLabel,outputLabel) != self.labels:
+         self.labels = (inputLabel,outputLabel)
+         self.inputLine.set_label(inputLabel)
+         self.outputLine.set_label(outputLabel)
+         self.ax.legend(fontsize=self.fontsize)
+         full = True
+      if title != self.title:
+         self.title = title
+         self.ax.set_title(title,fontsize=self.fontsize)
+         full = True
+      if units != self.units:
+         self.units = units
+         self.ax.set_xlabel('Time ({})'.format(units),fontsize=self.fontsize)
+         self.ax.set_ylabel('Amplitude',fontsize=self.fontsize)
+         full = True
+      self.show()
+      if full:
+         self.canvas.draw()
+      else:
+         self.canvas.restore_region(self.background)
+         self.drawLines()
+         self.canvas.blit(self.ax.bbox)
+
+   def show(self):
+      if not self.visible:
+         self.canvas.get_tk_widget().pack(padx=15)
+         self.button.pack(side='bottom')
+         self.visible = True
+
+   def hide(self):
+      if self.visible:
+         self.button.pack_forget()
+         self.canvas.get_tk_widget().pack_forget()
+         self.visible = False
+
+def heatmap(ax,x,y,values,xlabel,ylabel,title,fontsize=None):
+   # Draws a two dimensional slice of a Sweep.sweep index, values[i,j] being
+   # the index for x[i] (horizontal axis) and y[j] (vertical axis). NaN values
+   # (unstable or invalid tunings) are left blank and the lowest value is marked.
+   # Returns: the QuadMesh, for a colorbar.
+   values = np.ma.masked_invalid(np.asarray(values,dtype=float))
+   mesh = ax.pcolormesh(np.asarray(x),np.asarray(y),values.T,shading='nearest',cmap='viridis')
+   if values.count() > 0:
+      i,j = np.unravel_index(np.ma.argmin(values),values.shape)
+      ax.plot(x[i],y[j],'r+',markersize=10)
+   ax.set_xlabel(xlabel,fontsize=fontsize)
+   ax.set_ylabel(ylabel,fontsize=fontsize)
+   ax.set_title(title,fontsize=fontsize)
+   return mesh
@@ -0,0 +1,110 @@
+###########################################################
+#######           CONTROL SYSTEMS SIMULATOR         #######
+#######              PROCESS POOL                   #######
+###########################################################
+
+# Multi-core execution of parameter studies. A pool of worker processes is
+# started once and kept warm: every worker imports the simulation core (and
+# with it control and scipy) when it starts, so the import cost is not paid
+# per task. Work items are grouped in chunks to amortize the inter-process
+# communication, the results are returned in the order of the items and an
+# optional callback reports the progress as chunks complete.
+#
+# Functions sent to the pool must be defined at module level so they can be
+# pickled. On platforms that spawn processes (Windows, macOS) the calling
+# script must create the pool under an "if __name__ == '__main__':" guard.
+
+# Libraries.
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import importlib
+import math
+import os
+import numpy as np
+
+def warmUp():
+   # Worker initializer: loads the simulation core once per process, so the
+   # tasks find it in the module cache.
+   importlib.import_module('Simulation')
+   importlib.import_module('Sweep')
+
+def runChunk(fn,items):
+   # Returns: [fn(item) for every item of the chunk].
+   return [fn(item) for item in items]
+
+def simulateCase(case):
+   # Runs one Simulation.simulate call, case being its keyword arguments.
+   # Returns: the simulation results.
+   import Simulation
+   return Simulation.simulate(**case)
+
+def sweepCase(case):
+   # Runs one Sweep.sweep call, case being its keyword arguments.
+   # Returns: the sweep results.
+   import Sweep
+   return Sweep.sweep(**case)
+
+class SimulationPool:
+   # Pool of warm worker processes. Usable as a context manager.
+
+   def __init__(self,workers=None):
+      self.workers = workers or os.cpu_count() or 1
+      self.executor = ProcessPoolExecutor(max_workers=self.workers,initializer=warmUp)
+
+   def __enter__(self):
+      return self
+
+   def __exit__(self,*exc):
+      self.shutdown()
+
+   def map(self,fn,items,chunkSize=None,progress=None):
+      # Applies fn to every item in the worker processes. chunkSize is the
+      # number of items per task, by default about four tasks per worker.
+      # progress, if given, is called as progress(done,total) in the calling
+      # thread every time a chunk completes.
+      # Returns: list of results in the order of items.
+      items = list(items)
+      total = len(items)
+      if total == 0:
+         return []
+      if chunkSize is None:
+         chunkSize = max(1,math.ceil(total/(4*self.workers)))
+      futures = {}
+      for start in range(0,total,chunkSize):
+         futures[self.executor.submit(runChunk,fn,items[start:start+chunkSize])] = start
+      results = [None]*total
+      done = 0
+      try:
+         for future in as_completed(futures):
+            chunk = future.result()
+            start = futures[future]
+            results[start:start+len(chunk)] = chunk
+            done += len(chunk)
+            if progress is not None:
+               progress(done,total)
+      except BaseException:
+         for future in futures:
+            future.cancel()
+         raise
+      return results
+
+   def simulate(self,cases,chunkSize=None,progress=None):
+      # Runs Simulation.simulate for every case (a dictionary of its keyword
+      # arguments).
+      # Returns: list of results in the order of cases.
+      return self.map(simulateCase,cases,chunkSize,progress)
+
+   def sweep(self,progress=None,**params):
+      # Runs Sweep.sweep with the given keyword arguments, splitting the
+      # longest of the kp, ki, kd and alpha grids across the workers.
+      # Returns: the sweep results, as from a single Sweep.sweep call.
+      names = ('kp','ki','kd','alpha')
+      values = {name: np.atleast_1d(np.asarray(params[name],dtype=float)) for name in names}
+      axis = int(np.argmax([len(values[name]) for name in names]))
+      split = names[axis]
+      parts = [part for part in np.array_split(values[split],min(len(values[split]),4*self.workers)) if len(part)]
+      cases = [dict(params,**{split: part}) for part in parts]
+      results = self.map(sweepCase,cases,1,progress)
+      return {key: np.concatenate([r[key] for r in results],axis=axis) for key in results[0]}
+
+   def shutdown(self):
+      self.executor.shutdown(wait=True,cancel_futures=True)
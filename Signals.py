@@ -0,0 +1,116 @@
+###########################################################
+#######           CONTROL SYSTEMS SIMULATOR         #######
+#######              INPUT SIGNALS                  #######
+###########################################################
+
+# Vectorized input signal generators. Every signal is zero before the input
+# time tin and is built without Python loops over the time samples. Generated
+# signals are cached per time grid and signal specification and returned as
+# read-only arrays, so they must be copied before being modified.
+
+# Libraries.
+import numpy as np
+from Cache import LRUCache
+
+# Signals already generated, keyed by time grid and signal specification.
+signals = LRUCache(maxEntries=64)
+
+# Feedback taps of maximum length linear feedback shift registers, by order.
+prbsTaps = {
+   3: (3,2),
+   4: (4,3),
+   5: (5,3),
+   6: (6,5),
+   7: (7,6),
+   8: (8,6,5,4),
+   9: (9,5),
+   10: (10,7),
+}
+
+def step(time,ku,tin):
+   # Step with amplitude ku applied on t=tin.
+   # Returns: input array.
+   return np.where(time < tin,0.,ku)
+
+def ramp(time,ku,tin):
+   # Ramp with slope ku applied on t=tin. As in the original simulator the
+   # ramp is ku*t, so it jumps to ku*tin at the input time.
+   # Returns: input array.
+   return np.where(time < tin,0.,ku*time)
+
+def pulse(time,ku,tin,width):
+   # Rectangular pulse of amplitude ku starting on t=tin and lasting width.
+   # Returns: input array.
+   return np.where((time >= tin) & (time < tin+width),ku,0.)
+
+def sine(time,ku,tin,frequency,phase=0.):
+   # Sine wave of amplitude ku and the given frequency (cycles per time unit)
+   # starting on t=tin.
+   # Returns: input array.
+   return np.where(time < tin,0.,ku*np.sin(2*np.pi*frequency*(time-tin)+phase))
+
+def profile(time,ku,tin,steps):
+   # Multi-step setpoint profile. steps is a sequence of (time,value) pairs,
+   # times relative to tin; the value of the last step reached is held and
+   # scaled by ku.
+   # Returns: input array.
+   steps = sorted(steps,key=lambda s: s[0])
+   times = np.array([s[0] for s in steps],dtype=float)+tin
+   values = np.array([0.]+[s[1] for s in steps],dtype=float)
+   return ku*values[np.searchsorted(times,time,side='right')]
+
+def prbsSequence(order,seed=1):
+   # Maximum length binary sequence of the given LFSR order.
+   # Returns: array of 2**order-1 bits (0 or 1).
+   taps = prbsTaps[order]
+   n = 2**order-1
+   state = seed & n
+   if state == 0:
+      raise ValueError('PRBS seed must be nonzero.')
+   bits = np.empty(n,dtype=np.int8)
+   for k in range(n):  # One iteration per bit, not per time sample.
+      bits[k] = state & 1
+      feedback = 0
+      for tap in taps:
+         feedback ^= (state >> (order-tap)) & 1
+      state = (state >> 1) | (feedback << (order-1))
+   return bits
+
+def prbs(time,ku,tin,period,order=7,seed=1):
+   # Pseudo random binary sequence switching between -ku and ku, holding each
+   # bit for period time units and starting on t=tin.
+   # Returns: input array.
+   bits = prbsSequence(order,seed)
+   idx = np.floor((time-tin)/period).astype(np.int64) % len(bits)
+   return np.where(time < tin,0.,ku*(2*bits[idx]-1))
+
+generators = {
+   'step': step,
+   'ramp': ramp,
+   'pulse': pulse,
+   'sine': sine,
+   'profile': profile,
+   'prbs': prbs,
+}
+
+def spec(kind,ku,tin,**params):
+   # Hashable specification of a signal.
+   # Returns: (kind,ku,tin,params) tuple.
+   if kind not in generators:
+      raise ValueError('Unknown input signal: {}'.format(kind))
+   if 'steps' in params:
+      params['steps'] = tuple(tuple(float(v) for v in s) for s in params['steps'])
+   return (kind,float(ku),float(tin),tuple(sorted(params.items())))
+
+def generate(time,kind,ku,tin,**params):
+   # Builds (or reuses) the input signal kind of magnitude ku applied on t=tin
+   # over the time grid. params are the extra arguments of the generator.
+   # Returns: read-only input array.
+   time = np.asarray(time,dtype=float)
+   key = (hash(time.tobytes()),len(time),spec(kind,ku,tin,**params))
+   u = signals.get(key)
+   if u is not None:
+      return u
+   u = np.asarray(generators[kind](time,float(ku),float(tin),**dict(key[2][3])),dtype=float)
+   u.setflags(write=False)
+   return signals.put(key,u)
@@ -0,0 +1,494 @@
+###########################################################
+#######           CONTROL SYSTEMS SIMULATOR         #######
+#######              SIMULATION CORE                #######
+###########################################################
+
+# Headless simulation core. Nothing in this module touches tkinter, so it can
+# be imported from batch jobs, servers and tests without a display.
+
+# Libraries.
+import numpy as np
+from scipy.linalg import block_diag, matrix_balance, solve_continuous_lyapunov
+import control as co
+import Signals
+import Discrete
+import Delay
+import Metrics
+import Timing
+from Cache import LRUCache
+
+# Transfer functions simulated for each control mode, in the order the GUI
+# plots them and the order of the outputs of the stacked simulation model.
+modeOutputs = {
+   'process': ('P',),
+   'servo': ('MYR','UR','P'),
+   'reg': ('MYD','UD','P'),
+   'both': ('MYR','UR','MYD','UD'),
+}
+
+def conversion(input):
+   # Converts the input from string to a float array.
+   # Returns: final float array.
+   input = str(input)
+   caracters = "[]"
+   string = input.replace(caracters[0],"").replace(caracters[1],"")  # Remove '[]' from string.
+   list = string.split(',')  # List created from the string. String-type values.
+   final = [float(x) for x in list]  # List of floats created using the first list.
+   return final
+
+def processPolynomials(processType,gain,tau,zeta):
+   # Computes the P(s) numerator and denominator of the slider-defined process.
+   # "Standard" is the second order form in terms of natural frequency and damping,
+   # "Alt." is the two-pole form K/((a*T*s+1)(T*s+1)).
+   # Returns: numP,denP float lists.
+   if processType == 'Standard':
+      numP = [gain*(tau**2)]
+      denP = [1,(2*tau*zeta),tau**2]
+   else:
+      numP = [gain]
+      denP = [zeta*tau**2,tau*(zeta+1),1]
+   return [float(x) for x in numP],[float(x) for x in denP]
+
+def controllerCoefficients(controllerType,kp,ki,kd,alpha):
+   # Computes the C(s) numerator and denominator coefficients of the
+   # slider-defined PID. For the "Standard" and "Series" forms ki and kd are the
+   # Ti and Td times, for the "Parallel" form they are the integral and
+   # derivative gains. The parameters may be numpy arrays of tunings.
+   # Returns: numC,denC lists of three coefficients each.
+   if controllerType == 'Standard':
+      numC = [((alpha+1)*kp*kd*ki),kp*((alpha*kd+ki)),kp]
+      denC = [(alpha*kd*ki),ki,0]
+   elif controllerType == 'Parallel':
+      numC = [kd*(alpha*kp+1),kp+(alpha*ki*kd),ki]
+      denC = [alpha*kd,1,0]
+   elif controllerType == 'Series':
+      numC = [kp*ki*kd,ki+kd,kp]
+      denC = [alpha*ki*kd,ki,0]
+   else:
+      raise ValueError('Unknown controller type: {}'.format(controllerType))
+   return numC,denC
+
+def controllerPolynomials(controllerType,kp,ki,kd,alpha):
+   # Computes the C(s) numerator and denominator of the slider-defined PID.
+   # Returns: numC,denC float lists.
+   numC,denC = controllerCoefficients(controllerType,kp,ki,kd,alpha)
+   return [float(x) for x in numC],[float(x) for x in denC]
+
+def balanced(sys):
+   # Rescales the states of sys so that the rows and columns of A have similar
+   # norms. Companion realizations of high order Pade approximations are
+   # otherwise badly conditioned and lose accuracy in every simulation engine.
+   # Returns: equivalent state space model.
+   if sys.A.shape[0] == 0:
+      return sys
+   A,(scale,perm) = matrix_balance(sys.A,permute=False,separate=True)
+   return co.ss(A,sys.B/scale[:,None],sys.C*scale[None,:],sys.D)
+
+# Pade approximations already realized, keyed by dead time and order, so only
+# changes of the dead time or the order compute a new one.
+pades = LRUCache(maxEntries=64)
+
+# Largest normalized frequency w*L of the phase tolerance of every Pade order,
+# keyed by order and tolerance.
+phaseLimits = LRUCache(maxEntries=256)
+
+# Automatic Pade order: highest order and default phase error tolerance (rad).
+maxPadeOrder = 20
+padeTolerance = 0.01
+
+def pade(L,order):
+   # Realizes the Pade approximation of e^(-L*s) of the given order.
+   # Returns: balanced state space model, shared between callers.
+   key = (float(L),int(order))
+   Pade = pades.get(key)
+   if Pade is None:
+      with Timing.stage('pade'):
+         numPade,denPade = co.pade(float(L),n=int(order))
+      with Timing.stage('tf'):
+         Pade = pades.put(key,balanced(co.ss(co.tf(numPade,denPade))))
+   return Pade
+
+def phaseLimit(order,tolerance):
+   # The phase of the Pade approximation of e^(-L*s) depends on w*L only, so
+   # the frequencies where it is accurate scale with 1/L. Its phase error grows
+   # with the frequency.
+   # Returns: largest w*L with a phase error within tolerance (rad).
+   key = (int(order),float(tolerance))
+   limit = phaseLimits.get(key)
+   if limit is None:
+      numPade,denPade = co.pade(1.,n=int(order))
+      x = np.linspace(0,4*(order+1),800*(order+1)+1)
+      phase = np.unwrap(np.angle(np.polyval(numPade,1j*x)/np.polyval(denPade,1j*x)))
+      error = np.abs(phase-phase[0]+x)
+      over = np.nonzero(error > tolerance)[0]
+      limit = phaseLimits.put(key,float(x[over[0]-1] if len(over) else x[-1]))
+   return limit
+
+def autoPadeOrder(numP,denP,L,numC=None,denC=None,tolerance=padeTolerance):
+   # Picks the lowest Pade order whose phase error stays within tolerance (rad)
+   # up to the bandwidth of the closed loop (of the process without controller),
+   # see Delay.bandwidth.
+   # Returns: order, at most maxPadeOrder.
+   if L <= 0:
+      return 1
+   x = Delay.bandwidth(numP,denP,float(L),numC,denC)*float(L)
+   for order in range(1,maxPadeOrder+1):
+      if phaseLimit(order,tolerance) >= x:
+         return order
+   return maxPadeOrder
+
+def padeDegree(numP,denP,L,padeOrder,numC=None,denC=None,tolerance=padeTolerance):
+   # Returns: padeOrder, or the automatic order (see autoPadeOrder) if it is 'auto'.
+   if padeOrder == 'auto':
+      return autoPadeOrder(numP,denP,L,numC,denC,tolerance)
+   return int(padeOrder)
+
+def process(numP,denP,L,padeOrder):
+   # Builds the process model A(s)*e^(-L*s), with the dead time replaced by its
+   # Pade approximation of the given order ('auto' picks it from the process
+   # bandwidth, see autoPadeOrder). Both factors are realized in state space
+   # separately and connected in series, so no polynomial products are formed.
+   # Returns: P, the process state space model.
+   Pade = pade(L,padeDegree(numP,denP,L,padeOrder))
+   with Timing.stage('tf'):
+      A = balanced(co.ss(co.tf(numP,denP)))
+      return A*Pade
+
+def closedLoop(C,P):
+   # Builds a single state space realization of the implemented loop,
+   # e = r-y, u = C*e, y = P*(u+d), with states [xp,xc].
+   # C and P must be proper SISO models (state space or transfer functions).
+   # Returns: state space model with inputs [r,d] and outputs [y,u,e].
+   #          Row/column pairs give MYR, MYD, UR, UD and S without any
+   #          transfer function algebra.
+   C = co.ss(C);P = co.ss(P)
+   Ap,Bp,Cp,Dp = P.A,P.B,P.C,P.D[0,0]
+   Ac,Bc,Cc,Dc = C.A,C.B,C.C,C.D[0,0]
+   if 1+Dc*Dp == 0:
+      raise ValueError('Ill-posed loop: 1+C(inf)*P(inf) = 0.')
+   k = 1/(1+Dc*Dp)
+   np_ = Ap.shape[0];nc = Ac.shape[0]
+   # u = Mx*x + Mr*r + Md*d.
+   Mx = k*np.hstack([-Dc*Cp,Cc])
+   Mr = k*Dc
+   Md = -k*Dc*Dp
+   # y = Yx*x + Yr*r + Yd*d.
+   Yx = np.hstack([Cp,np.zeros((1,nc))]) + Dp*Mx
+   Yr = Dp*Mr
+   Yd = Dp*Md + Dp
+   # e = r - y.
+   Ex = -Yx;Er = 1-Yr;Ed = -Yd
+   A = np.vstack([np.hstack([Ap,np.zeros((np_,nc))]) + Bp@Mx,
+                  np.hstack([np.zeros((nc,np_)),Ac]) + Bc@Ex])
+   B = np.vstack([np.hstack([Bp*Mr,Bp*(Md+1)]),
+                  np.hstack([Bc*Er,Bc*Ed])])
+   Cl = np.vstack([Yx,Mx,Ex])
+   D = np.array([[Yr,Yd],[Mr,Md],[Er,Ed]])
+   return balanced(co.ss(A,B,Cl,D))
+
+def loopChannel(loop,input,outputs):
+   # Selects one input (0 for r, 1 for d) and a slice of the outputs of the
+   # closed loop model.
+   # Returns: single input state space model.
+   return co.ss(loop.A,loop.B[:,input:input+1],loop.C[outputs,:],loop.D[outputs,input:input+1])
+
+def commonInput(systems):
+   # Stacks single input systems so that one input signal drives all of them.
+   # Returns: single input state space model whose outputs are the outputs of
+   #          every system, in order.
+   A = block_diag(*[sys.A for sys in systems])
+   B = np.vstack([sys.B for sys in systems])
+   C = block_diag(*[sys.C for sys in systems])
+   D = np.vstack([sys.D for sys in systems])
+   return co.ss(A,B,C,D)
+
+# Unit responses already computed, keyed by model and time grid. The input
+# magnitude and input time only scale and shift these, so editing them does
+# not require a new integration.
+unitResponses = LRUCache(maxEntries=32)
+
+def forcedResponse(sys,time,u,engine='forced'):
+   # Simulates sys from rest with either co.forced_response ('forced') or the
+   # exact discretization engine of Discrete.py ('discrete', uniform grids only).
+   # Both assume an input linear between samples and agree within 1e-9 of the
+   # output range for the balanced models built here.
+   # Returns: ya, the response with one row per output.
+   if engine == 'discrete':
+      return Discrete.simulate(sys,np.asarray(time),u)
+   ta,ya = co.forced_response(sys,time,u)
+   return np.atleast_2d(np.asarray(ya))
+
+def unitResponse(sys,time,base,engine='forced'):
+   # Computes (or reuses) the response of sys to a unit base input on a uniform
+   # time grid starting from rest. base is 'step0' (u = 1 from t[0]), 'step1'
+   # (u = 0 at t[0] and 1 from t[1]) or 'ramp0' (u = t-t[0]).
+   # Returns: ya, the response with one row per output.
+   key = (sys.A.tobytes(),sys.B.tobytes(),sys.C.tobytes(),sys.D.tobytes(),sys.A.shape,sys.C.shape,
+          float(time[0]),float(time[-1]),len(time),base,engine)
+   ya = unitResponses.get(key)
+   if ya is not None:
+      return ya
+   if base == 'step0': u = np.ones(len(time))
+   elif base == 'step1': u = np.ones(len(time));u[0] = 0.
+   else: u = time-time[0]
+   return unitResponses.put(key,forcedResponse(sys,time,u,engine))
+
+def shifted(ya,k0,ntp):
+   # Delays ya by k0 samples, keeping the first ntp samples.
+   # Returns: delayed response, zero before sample k0.
+   y = np.zeros((ya.shape[0],ntp))
+   y[:,k0:] = ya[:,:ntp-k0]
+   return y
+
+def response(tf,ku,tin,time,signal,engine='forced',**params):
+   # Computes the desired input (see Signals.generators) of magnitude ku and
+   # applied on t=tin. params are the extra arguments of the signal, e.g. width
+   # for a pulse. Computes the system response to the desired input. tf may
+   # have several outputs, in which case ya holds one row per output.
+   # For an LTI system starting at rest a step or ramp response is a scaled and
+   # shifted unit response, so only the unit responses are integrated (once per
+   # model and time grid, see unitResponse) and the time grid must be uniform.
+   # Other signals are simulated directly. engine selects the simulation engine,
+   # see forcedResponse.
+   # Returns: ta,ya,ua: time and response values and the input computed.
+   sys = tf if isinstance(tf,co.StateSpace) else co.ss(tf)
+   u = Signals.generate(time,signal,ku,tin,**params)
+   if signal != 'step' and signal != 'ramp':
+      ya = forcedResponse(sys,time,u,engine)
+      if ya.shape[0] == 1: ya = ya[0]
+      return np.asarray(time),ya,u
+   ntp = len(time)
+   k0 = int(np.searchsorted(time,tin))  # First sample with time >= tin.
+   ya = np.zeros((sys.C.shape[0],ntp))
+   stepHeight = 0.
+   if signal == 'step':
+      stepHeight = ku
+   elif k0 < ntp:
+      # Ramp of slope ku starting at zero on t[k0] plus a step of height ku*t[k0].
+      ya += ku*shifted(unitResponse(sys,time,'ramp0',engine),k0,ntp)
+      stepHeight = ku*time[k0]
+   if k0 < ntp and stepHeight != 0:
+      # Input interpolates linearly between samples, so a step after t[0] rises
+      # over one sample interval.
+      if k0 == 0:
+         ya += stepHeight*unitResponse(sys,time,'step0',engine)
+      else:
+         ya += stepHeight*shifted(unitResponse(sys,time,'step1',engine),k0-1,ntp)
+   if ya.shape[0] == 1: ya = ya[0]
+   return np.asarray(time),ya,u
+
+def performanceIndexes(FT,yinput,y,t,ua=None):
+   # Computes de IAE, ISE and ITAE of a given system response.
+   # Also computes de control effort TVu of a given control signal (not for 'P').
+   # The response is integrated in chunks (see Metrics.py), so no full length
+   # temporaries are created.
+   # Returns: dictionary with the IAE, ISE, ITAE and TV values.
+   accumulator = Metrics.IndexAccumulator()
+   for start in range(0,len(t),Metrics.chunkSamples):
+      part = slice(start,start+Metrics.chunkSamples)
+      if FT == 'MYD': error = -y[part]
+      else: error = yinput[part]-y[part]
+      accumulator.update(t[part],error,None if FT == 'P' else ua[part])
+   return accumulator.result()
+
+def stepDeviations(A,B,C,D,ku):
+   # For a step of height ku applied from rest to the single input model
+   # (A,B,C,D), computes the final value of every output and the exact integral
+   # over [0,inf) of its squared deviation from that value. The state deviation
+   # from the steady state starts at x0 = A^-1*B*ku and decays as e^(A*t)*x0, so
+   # the integrals are the diagonal of C*X*C' with A*X + X*A' + x0*x0' = 0.
+   # Returns: (final values,integrals), or None if the model is not
+   #          asymptotically stable.
+   if A.shape[0] == 0 or np.max(np.linalg.eigvals(A).real) >= 0:
+      return None
+   x0 = np.linalg.solve(A,B[:,0])*ku
+   final = D[:,0]*ku - C@x0
+   X = solve_continuous_lyapunov(A,-np.outer(x0,x0))
+   return final,np.diag(C@X@C.T).copy()
+
+def analyticIndexes(sys,ku,target):
+   # Closed-form ISE of the step response of sys, whose first output is y and
+   # whose error is target-y, and for loops (second output u) the H2 control
+   # effort ISU, the integral of the squared deviation of u from its final value.
+   # Unlike the simulated indexes they have no time grid or horizon truncation.
+   # Returns: dictionary with the ISE and ISU (None without a u output) values, or
+   #          None if the loop is unstable or the error does not vanish, in which
+   #          case the simulated indexes must be used.
+   deviations = stepDeviations(sys.A,sys.B,sys.C,sys.D,ku)
+   if deviations is None:
+      return None
+   final,integrals = deviations
+   if abs(target-final[0]) > 1e-9*max(abs(ku),1.):
+      return None
+   return {'ISE': float(integrals[0]),'ISU': float(integrals[1]) if len(integrals) > 1 else None}
+
+def maxSensitivity(S):
+   # Closed Loop maximum sensitivity Ms.
+   # Returns: Ms, the maximum value of the magnitude of S.
+   m,p,w = co.bode_plot(S,plot=False)  # This bode function is used to obtain the magnitude of S.
+   return max(m)
+
+# Limits of the adaptive time grid.
+minPoints = 201
+maxPoints = 200001
+
+def adaptivePoints(sys,simTime,L,tolerance):
+   # Picks the number of samples of a uniform time grid over simTime from the
+   # fastest dynamics of sys and the dead time L. The trapezoidal rule applied
+   # to a mode e^(-p*t) has a relative error close to (p*h)^2/12, so the step
+   # is h = sqrt(12*tolerance)/w, where w is the largest pole magnitude or
+   # 1/L, whichever is faster.
+   # Returns: number of time samples, between minPoints and maxPoints.
+   w = 0.
+   if sys.A.shape[0] > 0:
+      w = float(np.max(np.abs(np.linalg.eigvals(sys.A))))
+   if L > 0:
+      w = max(w,1/float(L))
+   if w == 0 or simTime <= 0:
+      return minPoints
+   h = np.sqrt(12*tolerance)/w
+   return int(min(max(np.ceil(simTime/h)+1,minPoints),maxPoints))
+
+# Complete simulation results, keyed by every parameter of simulate(). The
+# controller type and slider values are encoded in the C(s) polynomials.
+resultCache = LRUCache(maxEntries=256,maxBytes=128*2**20)
+
+def modeModel(numP,denP,L,padeOrder,mode,numC=None,denC=None,padeTolerance=padeTolerance):
+   # Builds the model simulated in mode. Every experiment of the mode is driven
+   # by the same input signal, so they are stacked into one system and
+   # integrated in a single pass. numC/denC are ignored in 'process' mode.
+   # padeOrder 'auto' picks the order from the bandwidth of the simulated loop
+   # and padeTolerance (see autoPadeOrder).
+   # Returns: (sys,experiments,Ms): the stacked single input model, whose
+   #          outputs are those of modeOutputs[mode], the model of every
+   #          experiment keyed by 'P', 'MYR' and 'MYD' (outputs [y] or [y,u])
+   #          and the maximum sensitivity (None in 'process' mode).
+   if mode == 'process':
+      padeOrder = padeDegree(numP,denP,L,padeOrder,tolerance=padeTolerance)
+   else:
+      padeOrder = padeDegree(numP,denP,L,padeOrder,numC,denC,padeTolerance)
+   P = process(numP,denP,L,padeOrder)
+   experiments = {'P': P}
+   if mode == 'process':
+      return P,experiments,None
+   with Timing.stage('tf'):
+      C = co.tf(numC,denC)
+      loop = closedLoop(C,P)
+      servo = loopChannel(loop,0,slice(0,2))
+      reg = loopChannel(loop,1,slice(0,2))
+      experiments.update(MYR=servo,MYD=reg)
+      if mode == 'servo':
+         sys = commonInput([servo,P])
+      elif mode == 'reg':
+         sys = commonInput([reg,P])
+      else:
+         sys = commonInput([servo,reg])
+   with Timing.stage('sensitivity'):
+      Ms = maxSensitivity(loopChannel(loop,0,slice(2,3)))
+   return sys,experiments,Ms
+
+def delayModel(numP,denP,mode,numC=None,denC=None):
+   # Builds the rational parts of the loop simulated by the 'delay' engine,
+   # which realizes the dead time exactly instead of with a Pade approximation.
+   # Returns: (A,C): A(s) and C(s) state space models (C is None in 'process' mode).
+   A = balanced(co.ss(co.tf(numP,denP)))
+   if mode == 'process':
+      return A,None
+   return A,balanced(co.ss(co.tf(numC,denC)))
+
+def delayResponse(A,C,L,mode,time,signal,magnitude,timeIn,**signalParams):
+   # Simulates mode with the exact dead time L (see Delay.py). The reaction
+   # curve is the response of A(s) shifted by L; the loops are integrated with
+   # a delay line between the controller and the process.
+   # Returns: (ya,u): responses with one row per output of modeOutputs[mode]
+   #          and the input.
+   u = Signals.generate(time,signal,magnitude,timeIn,**signalParams)
+   outputs = modeOutputs[mode]
+   rows = {}
+   if 'P' in outputs:
+      rows['P'] = Delay.shift(response(A,magnitude,timeIn,time,signal,'discrete',**signalParams)[1],time,L)
+   zero = np.zeros(len(time))
+   if 'MYR' in outputs:
+      rows['MYR'],rows['UR'] = Delay.simulateLoop(A,C,time,u,zero,L)
+   if 'MYD' in outputs:
+      rows['MYD'],rows['UD'] = Delay.simulateLoop(A,C,time,zero,u,L)
+   return np.array([rows[name] for name in outputs]),u
+
+def simulate(numP,denP,L,padeOrder,mode,signal,magnitude,timeIn,simTime,numC=None,denC=None,points=5001,tolerance=1e-3,engine='forced',metrics='simulated',padeTolerance=padeTolerance,**signalParams):
+   # Simulates the loop for the given process, controller, dead time, Pade order
+   # (or 'auto', the lowest order whose phase error is within padeTolerance rad
+   # up to the loop bandwidth, see autoPadeOrder) and input. mode is one of
+   # 'process', 'servo', 'reg' or 'both' and signal is one of Signals.generators
+   # ('step', 'ramp', 'pulse', ...) with its extra arguments in signalParams. numC/denC are ignored in 'process' mode.
+   # points is the number of time samples, or 'auto' to choose it from the loop
+   # dynamics and the error tolerance (see adaptivePoints). engine is 'forced'
+   # (co.forced_response), 'discrete' (exact discretization, see Discrete.py)
+   # or 'delay' (exact discretization and exact dead time, see Delay.py; padeOrder
+   # is then ignored and the analytic metrics are not available).
+   # metrics is 'simulated' (indexes integrated over the time grid) or 'analytic'
+   # (exact ISE and control effort ISU for step inputs and stable loops, see
+   # analyticIndexes; other indexes and inputs fall back to the simulated ones).
+   # Returns: dictionary with the time vector 't', the input 'input', one response
+   # per simulated transfer function (keyed as in modeOutputs), the performance
+   # 'indexes' keyed by 'P', 'MYR' and/or 'MYD', the maximum sensitivity 'Ms'
+   # (None in 'process' mode) and the Pade order used 'padeOrder' (None with
+   # the 'delay' engine).
+   # Results are memoized in resultCache and shared between callers, so they
+   # must not be modified.
+   key = (tuple(float(x) for x in numP),tuple(float(x) for x in denP),float(L),
+          None if engine == 'delay' else padeOrder if padeOrder == 'auto' else int(padeOrder),mode,
+          Signals.spec(signal,magnitude,timeIn,**signalParams),float(simTime),
+          None if numC is None or mode == 'process' else tuple(float(x) for x in numC),
+          None if denC is None or mode == 'process' else tuple(float(x) for x in denC),
+          points if points == 'auto' else int(points),float(tolerance) if points == 'auto' else None,engine,metrics,
+          float(padeTolerance) if padeOrder == 'auto' else None)
+   results = resultCache.get(key)
+   if results is not None:
+      return results
+   if engine == 'delay' and float(L) <= 0:
+      engine = 'discrete'  # Without dead time there is nothing to delay.
+   if engine == 'delay':
+      with Timing.stage('tf'):
+         A,C = delayModel(numP,denP,mode,numC,denC)
+      if points == 'auto':
+         points = adaptivePoints(A if C is None else commonInput([A,C]),simTime,L,tolerance)
+      t = np.linspace(0,simTime,points)
+      with Timing.stage('simulation'):
+         ya,inp = delayResponse(A,C,float(L),mode,t,signal,magnitude,timeIn,**signalParams)
+      with Timing.stage('sensitivity'):
+         Ms = None if C is None else Delay.maxSensitivity(numP,denP,float(L),numC,denC)
+      experiments = padeOrder = None
+   else:
+      if mode == 'process':
+         padeOrder = padeDegree(numP,denP,L,padeOrder,tolerance=padeTolerance)
+      else:
+         padeOrder = padeDegree(numP,denP,L,padeOrder,numC,denC,padeTolerance)
+      sys,experiments,Ms = modeModel(numP,denP,L,padeOrder,mode,numC,denC)
+      if points == 'auto':
+         points = adaptivePoints(sys,simTime,L,tolerance)
+      t = np.linspace(0,simTime,points)
+      with Timing.stage('simulation'):
+         ta,ya,inp = response(sys,magnitude,timeIn,t,signal,engine,**signalParams)
+   ya = np.atleast_2d(ya)
+   results = {'t': t,'input': inp}
+   for i,name in enumerate(modeOutputs[mode]):
+      results[name] = ya[i]
+   with Timing.stage('indexes'):
+      results['indexes'] = {}
+      if 'P' in results:
+         results['indexes']['P'] = performanceIndexes('P',inp,results['P'],t)
+      if 'MYR' in results:
+         results['indexes']['MYR'] = performanceIndexes('MYR',inp,results['MYR'],t,results['UR'])
+      if 'MYD' in results:
+         results['indexes']['MYD'] = performanceIndexes('MYD',inp,results['MYD'],t,results['UD'])
+      if metrics == 'analytic' and signal == 'step' and experiments is not None:
+         for FT in results['indexes']:
+            exact = analyticIndexes(experiments[FT],magnitude,0. if FT == 'MYD' else magnitude)
+            if exact is not None:
+               results['indexes'][FT].update(exact)
+   results['Ms'] = Ms
+   results['padeOrder'] = padeOrder
+   for name in modeOutputs[mode]:
+      results[name].setflags(write=False)
+   t.setflags(write=False)
+   return resultCache.put(key,results)
@@ -0,0 +1,78 @@
+###########################################################
+#######           CONTROL SYSTEMS SIMULATOR         #######
+#######              STREAMING SIMULATION           #######
+###########################################################
+
+# Long-horizon simulations with bounded memory. The time grid is integrated in
+# chunks with the exact discretization engine (Discrete.simulateFrom), carrying
+# the state from one chunk to the next, so the result is the same as a single
+# simulation over the whole grid. Every chunk is written to a memory-mapped
+# .npy file on disk, its performance indexes are accumulated (Metrics.py) and
+# only a decimated view of the series is kept in memory for plotting. Memory
+# use depends on the chunk size and the plotted points, not on the horizon.
+
+# Libraries.
+import numpy as np
+import Simulation as sim
+import Signals
+import Discrete
+import Metrics
+
+def decimation(points,plotPoints):
+   # Returns: stride between the samples kept for plotting.
+   return max(1,int(np.ceil((points-1)/max(plotPoints-1,1))))
+
+def simulate(path,numP,denP,L,padeOrder,mode,signal,magnitude,timeIn,simTime,numC=None,denC=None,points=5001,
+             chunk=65536,plotPoints=5001,**signalParams):
+   # Simulates like Simulation.simulate (exact discretization engine, uniform
+   # grid of points samples) but in chunks of chunk samples. The series are
+   # written to the .npy file path as a (rows,points) array whose rows are the
+   # time, the input and the outputs of Simulation.modeOutputs[mode]; open it
+   # with np.load(path,mmap_mode='r') to read it without loading it whole.
+   # Returns: dictionary as from Simulation.simulate, with the time, input and
+   #          outputs decimated to about plotPoints samples, plus the 'path',
+   #          the number of 'points' written and the 'rows' names of the file.
+   sys,experiments,Ms = sim.modeModel(numP,denP,L,padeOrder,mode,numC,denC)
+   names = sim.modeOutputs[mode]
+   spec = Signals.spec(signal,magnitude,timeIn,**signalParams)
+   generator = Signals.generators[signal]
+   points = int(points)
+   chunk = max(int(chunk),2)
+   h = simTime/(points-1) if points > 1 else 0.
+   rows = ('t','input')+names
+   output = np.lib.format.open_memmap(path,mode='w+',dtype=float,shape=(len(rows),points))
+   stride = decimation(points,plotPoints)
+   accumulators = {FT: Metrics.IndexAccumulator() for FT in ('P','MYR','MYD') if FT in names}
+   view = [[] for _ in rows]
+   z = None
+   start = 0
+   while start < points:
+      # Chunks overlap on one sample: the state on the last sample of a chunk
+      # is the initial state of the next one, which writes that sample.
+      stop = min(start+chunk,points)
+      end = min(stop+1,points)
+      t = np.arange(start,end)*h
+      u = generator(t,float(magnitude),float(timeIn),**dict(spec[3]))
+      y,z = Discrete.simulateFrom(sys,t,u,z,h=h)
+      n = stop-start
+      values = [t[:n],u[:n]]+list(y[:,:n])
+      for i,row in enumerate(values):
+         output[i,start:stop] = row
+         view[i].append(row[-start % stride::stride].copy())
+      series = dict(zip(names,values[2:]))
+      for FT,accumulator in accumulators.items():
+         if FT == 'MYD': error = -series['MYD']
+         else: error = u[:n]-series[FT]
+         accumulator.update(t[:n],error,None if FT == 'P' else series['UR' if FT == 'MYR' else 'UD'])
+      start = stop
+   output.flush()
+   results = {name: np.concatenate(values) for name,values in zip(rows,view)}
+   if (points-1) % stride != 0:
+      # The last sample is always plotted.
+      for name,row in zip(rows,output[:,-1]):
+         results[name] = np.append(results[name],row)
+   results['indexes'] = {FT: accumulator.result() for FT,accumulator in accumulators.items()}
+   results['Ms'] = Ms
+   results.update(path=path,points=points,rows=rows)
+   del output
+   return results
@@ -0,0 +1,171 @@
+###########################################################
+#######           CONTROL SYSTEMS SIMULATOR         #######
+#######              PID PARAMETER SWEEP            #######
+###########################################################
+
+# Batch evaluation of PID tunings. Grids over the controller parameters of the
+# Standard, Parallel and Series forms are simulated together: the closed loop
+# of every tuning is assembled, discretized and stepped as a stack of matrices,
+# so the cost of a Python loop is paid once per time sample for a whole chunk
+# of tunings instead of once per sample and tuning. The discretization is the
+# exact first order hold of Discrete.py, so the indexes match Simulation.simulate
+# for the same grid. Unstable, improper or ill-posed tunings are not simulated
+# and their indexes are NaN, which leaves them blank in Plotting.heatmap.
+
+# Libraries.
+import numpy as np
+from scipy.linalg import expm
+import Simulation as sim
+import Signals
+import Metrics
+
+# Tunings simulated together. Bounds the memory of the stacked matrices.
+chunkSize = 2048
+
+def controllers(controllerType,kp,ki,kd,alpha):
+   # Two state realizations of a stack of PID controllers, see
+   # Simulation.controllerCoefficients for the parameters. A PID with filtered
+   # derivative is realized in controllable canonical form; a PI uses the first
+   # state only and leaves the second one decoupled at rest.
+   # Returns: Ac (N,2,2), Bc (N,2,1), Cc (N,1,2), Dc (N,) and the mask of the
+   #          tunings that give a proper controller with integral action.
+   (n2,n1,n0),(d2,d1,d0) = [[np.broadcast_to(np.asarray(c,dtype=float),np.shape(kp)) for c in p]
+                            for p in sim.controllerCoefficients(controllerType,kp,ki,kd,alpha)]
+   N = len(kp)
+   pid = d2 != 0
+   pi = (d2 == 0) & (n2 == 0) & (d1 != 0)
+   valid = (pid | pi) & np.isfinite(n2+n1+n0+d2+d1)
+   with np.errstate(divide='ignore',invalid='ignore'):
+      D = np.where(pid,n2/d2,np.where(pi,n1/d1,np.nan))
+      a1 = np.where(pid,d1/d2,1.)
+      c1 = np.where(pid,(n1-D*d1)/d2,0.)
+      c0 = np.where(pid,n0/d2,np.where(pi,n0/d1,np.nan))
+   Ac = np.zeros((N,2,2));Bc = np.zeros((N,2,1));Cc = np.zeros((N,1,2))
+   Ac[:,0,1] = np.where(pid,1.,0.)
+   Ac[:,1,1] = -a1
+   Bc[:,0,0] = np.where(pid,0.,1.)
+   Bc[:,1,0] = np.where(pid,1.,0.)
+   Cc[:,0,0] = c0
+   Cc[:,0,1] = c1
+   valid &= np.isfinite(D) & np.isfinite(c0) & np.isfinite(c1)
+   return Ac,Bc,Cc,D,valid
+
+def closedLoops(P,Ac,Bc,Cc,Dc,input):
+   # Stacked version of Simulation.closedLoop for one input (0 for r, 1 for d),
+   # keeping the y and u outputs.
+   # Returns: A (N,n,n), B (N,n), C (N,2,n), D (N,2) and the mask of well-posed loops.
+   Ap,Bp,Cp,Dp = P.A,P.B,P.C,P.D[0,0]
+   N = len(Dc);np_ = Ap.shape[0];nc = Ac.shape[1]
+   with np.errstate(divide='ignore',invalid='ignore'):
+      k = 1/(1+Dc*Dp)
+   posed = np.isfinite(k)
+   k = np.where(posed,k,0.)
+   # u = Mx*x + Mr*r + Md*d.
+   Mx = k[:,None,None]*np.concatenate([np.broadcast_to(-Dc[:,None,None]*Cp,(N,1,np_)),Cc],axis=2)
+   Mr = k*Dc
+   Md = -k*Dc*Dp
+   # y = Yx*x + Yr*r + Yd*d.
+   Yx = np.concatenate([np.broadcast_to(Cp,(N,1,np_)),np.zeros((N,1,nc))],axis=2) + Dp*Mx
+   Yr = Dp*Mr
+   Yd = Dp*Md + Dp
+   # e = r - y.
+   Ex = -Yx;Er = 1-Yr;Ed = -Yd
+   top = np.concatenate([np.broadcast_to(Ap,(N,np_,np_)),np.zeros((N,np_,nc))],axis=2) + Bp[None]@Mx
+   bottom = np.concatenate([np.zeros((N,nc,np_)),Ac],axis=2) + Bc@Ex
+   A = np.concatenate([top,bottom],axis=1)
+   if input == 0:
+      B = np.concatenate([Bp[None,:,0]*Mr[:,None],Bc[:,:,0]*Er[:,None]],axis=1)
+      D = np.stack([Yr,Mr],axis=1)
+   else:
+      B = np.concatenate([Bp[None,:,0]*(Md+1)[:,None],Bc[:,:,0]*Ed[:,None]],axis=1)
+      D = np.stack([Yd,Md],axis=1)
+   C = np.concatenate([Yx,Mx],axis=1)
+   return A,B,C,D,posed
+
+def indexes(A,B,C,D,t,r,mode):
+   # Steps a stack of single input loops from rest with the exact first order
+   # hold discretization and accumulates the indexes of Simulation.performanceIndexes
+   # on the fly, so the responses are never stored whole.
+   # Returns: dictionary with the IAE, ISE, ITAE and TV arrays.
+   N,n = B.shape
+   h = t[1]-t[0]
+   M = np.zeros((N,n+2,n+2))
+   M[:,:n,:n] = A*h
+   M[:,:n,n] = B*h
+   M[:,n,n+1] = 1.
+   E = expm(M)
+   Ad = E[:,:n,:n]
+   G1 = E[:,:n,n+1]
+   G0 = E[:,:n,n]-G1
+   # The y and u outputs are buffered for a chunk of samples and then added to
+   # the index accumulators.
+   accumulator = Metrics.IndexAccumulator()
+   chunk = min(len(t),256)
+   buffer = np.empty((N,2,chunk))
+   x = np.zeros((N,n,1))
+   for start in range(0,len(t),chunk):
+      stop = min(start+chunk,len(t))
+      for i in range(start,stop):
+         buffer[:,:,i-start] = (C@x)[:,:,0] + D*r[i]
+         if i+1 < len(t):
+            x = Ad@x + (G0*r[i]+G1*r[i+1])[:,:,None]
+      y = buffer[:,0,:stop-start];u = buffer[:,1,:stop-start]
+      error = r[start:stop]-y if mode == 'servo' else -y
+      accumulator.update(t[start:stop],error,u)
+   return accumulator.result()
+
+def analyticIndexes(A,B,C,D,ku,mode):
+   # Closed-form ISE and control effort ISU of every loop of the stack for a
+   # step of height ku, see Simulation.analyticIndexes.
+   # Returns: dictionary with the ISE and ISU arrays (NaN where the error does
+   #          not vanish).
+   target = ku if mode == 'servo' else 0.
+   ise = np.full(len(A),np.nan);isu = np.full(len(A),np.nan)
+   for i in range(len(A)):
+      deviations = sim.stepDeviations(A[i],B[i][:,None],C[i],D[i][:,None],ku)
+      if deviations is not None and abs(target-deviations[0][0]) <= 1e-9*max(abs(ku),1.):
+         ise[i],isu[i] = deviations[1]
+   return {'ISE': ise,'ISU': isu}
+
+def sweep(numP,denP,L,padeOrder,controllerType,kp,ki,kd,alpha,simTime,mode='servo',signal='step',magnitude=1.,timeIn=0.,points=5001,metrics='simulated',**signalParams):
+   # Simulates every combination of the kp, ki, kd and alpha values (scalars or
+   # sequences, see Simulation.controllerCoefficients) in the servo ('servo',
+   # indexes of MYR) or regulatory ('reg', indexes of MYD) experiment, for the
+   # process, Pade order and input of Simulation.simulate. With metrics set to
+   # 'analytic' and a step input only the exact ISE and control effort ISU are
+   # computed, without simulating; other inputs fall back to simulation.
+   # Returns: dictionary with the parameter grids 'kp', 'ki', 'kd' and 'alpha'
+   #          and the 'IAE', 'ISE', 'ITAE', 'TV', 'ISU' and 'stable' arrays, all
+   #          of shape (len(kp),len(ki),len(kd),len(alpha)). Indexes that are
+   #          not computed are NaN.
+   if mode not in ('servo','reg'):
+      raise ValueError('Sweep mode must be servo or reg: {}'.format(mode))
+   grids = np.meshgrid(*[np.atleast_1d(np.asarray(v,dtype=float)) for v in (kp,ki,kd,alpha)],indexing='ij')
+   shape = grids[0].shape
+   kp,ki,kd,alpha = [g.ravel() for g in grids]
+   P = sim.process(numP,denP,L,padeOrder)
+   t = np.linspace(0,simTime,int(points))
+   r = Signals.generate(t,signal,magnitude,timeIn,**signalParams)
+   results = {name: np.full(kp.size,np.nan) for name in ('IAE','ISE','ITAE','TV','ISU')}
+   analytic = metrics == 'analytic' and signal == 'step'
+   stable = np.zeros(kp.size,dtype=bool)
+   for start in range(0,kp.size,chunkSize):
+      part = slice(start,start+chunkSize)
+      Ac,Bc,Cc,Dc,valid = controllers(controllerType,kp[part],ki[part],kd[part],alpha[part])
+      A,B,C,D,posed = closedLoops(P,Ac,Bc,Cc,np.where(valid,Dc,0.),0 if mode == 'servo' else 1)
+      ok = valid & posed
+      if ok.any():
+         ok[ok] = np.max(np.linalg.eigvals(A[ok]).real,axis=1) < 0
+      stable[part] = ok
+      if ok.any() and analytic:
+         values = analyticIndexes(A[ok],B[ok],C[ok],D[ok],magnitude,mode)
+      elif ok.any() and len(t) > 1:
+         values = indexes(A[ok],B[ok],C[ok],D[ok],t,r,mode)
+      else:
+         values = {}
+      for name,value in values.items():
+         results[name][part][ok] = value
+   results = {name: value.reshape(shape) for name,value in results.items()}
+   results['stable'] = stable.reshape(shape)
+   results.update(kp=grids[0],ki=grids[1],kd=grids[2],alpha=grids[3])
+   return results
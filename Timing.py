@@ -0,0 +1,183 @@
+###########################################################
+#######           CONTROL SYSTEMS SIMULATOR         #######
+#######              STAGE TIMERS                   #######
+###########################################################
+
+# Low overhead timers for the stages of a run (input conversion, Pade
+# approximation, model building, simulation, indexes, drawing). A run is timed
+# by making a Record the current record of the thread that executes it; the
+# stage() blocks then add their durations to it. Outside a recording stage()
+# only checks a thread-local attribute, so the instrumentation can stay in
+# place. A record can be handed from the GUI thread to the background worker
+# and back, since only one thread uses it at a time. Finished records are
+# logged and added to a rolling window that summarizes every stage with its
+# median and 95th percentile. RealtimeMonitor measures the responsiveness of
+# realtime mode as the user sees it. Logging is off until enableLogging()
+# attaches a handler, since the application does not configure logging.
+
+# Libraries.
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+import logging
+import threading
+import time
+import numpy as np
+
+logger = logging.getLogger('simulator.timing')
+handler = None  # Handler added by enableLogging.
+local = threading.local()
+
+class Record:
+   # Durations of the stages of one run, in seconds, in the order first timed.
+
+   def __init__(self):
+      self.stages = OrderedDict()
+
+   def add(self,name,seconds):
+      self.stages[name] = self.stages.get(name,0.)+seconds
+
+   def total(self):
+      return sum(self.stages.values())
+
+   def text(self):
+      # Returns: one 'stage = ms' line per stage and the total.
+      lines = ['{} = {:.2f} ms'.format(name,seconds*1e3) for name,seconds in self.stages.items()]
+      return '\n'.join(lines+['total = {:.2f} ms'.format(self.total()*1e3)])
+
+@contextmanager
+def recording(record=None):
+   # Makes record (a new one if None) the current record of this thread.
+   # Returns: the record, as the value of the with statement.
+   previous = getattr(local,'record',None)
+   local.record = record if record is not None else Record()
+   try:
+      yield local.record
+   finally:
+      local.record = previous
+
+@contextmanager
+def stage(name):
+   # Adds the duration of the block to the current record, if any.
+   record = getattr(local,'record',None)
+   if record is None:
+      yield
+      return
+   start = time.perf_counter()
+   try:
+      yield
+   finally:
+      record.add(name,time.perf_counter()-start)
+
+def timed(record,fn,*args,**kwargs):
+   # Calls fn(*args,**kwargs) with record as the current record of this thread.
+   # Returns: (fn result,record).
+   with recording(record):
+      return fn(*args,**kwargs),record
+
+class Rolling:
+   # Stage durations of the last runs, for p50/p95 summaries.
+
+   def __init__(self,size=200):
+      self.size = size
+      self.stages = OrderedDict()
+      self.lock = threading.Lock()
+
+   def add(self,record):
+      with self.lock:
+         for name,seconds in list(record.stages.items())+[('total',record.total())]:
+            self.stages.setdefault(name,deque(maxlen=self.size)).append(seconds)
+
+   def summary(self):
+      # Returns: dictionary of (p50,p95) seconds keyed by stage.
+      with self.lock:
+         return OrderedDict((name,tuple(np.percentile(values,(50,95)))) for name,values in self.stages.items())
+
+   def text(self):
+      # Returns: one 'stage: p50 = ms, p95 = ms' line per stage.
+      return '\n'.join('{}: p50 = {:.2f} ms, p95 = {:.2f} ms'.format(name,p50*1e3,p95*1e3)
+                       for name,(p50,p95) in self.summary().items())
+
+def log(record,label='run'):
+   # Logs the stage durations of a finished run at INFO level.
+   if logger.isEnabledFor(logging.INFO):
+      logger.info('%s: %s',label,', '.join('{} {:.2f} ms'.format(name,seconds*1e3)
+                                           for name,seconds in list(record.stages.items())+[('total',record.total())]))
+
+def enableLogging(enabled=True,stream=None):
+   # Writes the log() lines to stream (stderr if None) when enabled, and
+   # stops writing them otherwise.
+   # Returns: None
+   global handler
+   if handler is not None:
+      logger.removeHandler(handler)
+      handler = None
+   if enabled:
+      handler = logging.StreamHandler(stream)
+      handler.setFormatter(logging.Formatter('%(asctime)s %(name)s: %(message)s'))
+      logger.addHandler(handler)
+   logger.setLevel(logging.INFO if enabled else logging.NOTSET)
+
+class RealtimeMonitor:
+   # End-to-end responsiveness of realtime mode: the latency from a change
+   # event to the painted results of the run that answers it, the painted
+   # frames per second and the runs dropped because a newer run superseded
+   # them. A change answered by a dropped run is carried to the next painted
+   # run, so its latency includes the superseded work.
+
+   def __init__(self,size=200,window=1.):
+      self.window = window  # s, frame rate averaging window.
+      self.latencies = deque(maxlen=size)
+      self.frames = deque()
+      self.pending = None  # Time of the oldest change not yet sent to a run.
+      self.carried = None  # Time of the oldest change answered by a dropped run.
+      self.runs = {}  # Change time answered by every run in flight, keyed by run.
+      self.events = 0
+      self.painted = 0
+      self.dropped = 0
+
+   def changed(self):
+      # Registers a change event (slider move or data edit).
+      self.events += 1
+      if self.pending is None:
+         self.pending = time.perf_counter()
+
+   def started(self,run):
+      # Registers a run that answers the changes pending since the last run.
+      self.runs[run] = self.pending if self.pending is not None else time.perf_counter()
+      self.pending = None
+
+   def drop(self,run):
+      # Registers a run whose results are discarded.
+      changeTime = self.runs.pop(run,None)
+      if changeTime is None:
+         return
+      self.dropped += 1
+      self.carried = changeTime if self.carried is None else min(self.carried,changeTime)
+
+   def paint(self,run):
+      # Registers the painted results of a run.
+      changeTime = self.runs.pop(run,None)
+      if changeTime is None:
+         return
+      now = time.perf_counter()
+      if self.carried is not None:
+         changeTime = min(changeTime,self.carried)
+         self.carried = None
+      self.painted += 1
+      self.latencies.append(now-changeTime)
+      self.frames.append(now)
+
+   def fps(self):
+      # Returns: painted frames per second over the last window.
+      now = time.perf_counter()
+      while self.frames and self.frames[0] < now-self.window:
+         self.frames.popleft()
+      return len(self.frames)/self.window
+
+   def text(self):
+      # Returns: one line summary for a status bar.
+      if not self.latencies:
+         return 'Realtime: no updates yet'
+      p50,p95 = np.percentile(self.latencies,(50,95))
+      return 'Realtime: latency {:.0f} ms (p50) / {:.0f} ms (p95) | {:.0f} fps | {} dropped of {} runs | {} events'.format(
+         p50*1e3,p95*1e3,self.fps(),self.dropped,self.painted+self.dropped,self.events)
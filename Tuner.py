@@ -0,0 +1,134 @@
+###########################################################
+#######           CONTROL SYSTEMS SIMULATOR         #######
+#######              PID AUTO-TUNER                 #######
+###########################################################
+
+# Searches the Kp, Ti/Ki, Td/Kd and alpha values of the Standard, Parallel or
+# Series PID that minimize the IAE, ISE or ITAE of the servo and/or regulatory
+# step responses, optionally keeping the control effort TVu under a limit. The
+# search is a bounded Nelder-Mead started from the current tuning. Parameters
+# can be rounded to the slider resolution before being evaluated, so the
+# optimum can be written back to the sliders as found, and every evaluated
+# tuning is memoized, so repeated or warm-started searches reuse the
+# simulations already done.
+
+# Libraries.
+import numpy as np
+from scipy.optimize import minimize
+import Simulation as sim
+import Sweep
+from Cache import LRUCache
+
+# Indexes of the tunings already evaluated, keyed by problem and tuning.
+evaluations = LRUCache(maxEntries=4096)
+
+# Objective value of unstable, improper or ill-posed tunings.
+unstablePenalty = 1e30
+
+# Weight of the squared relative TVu excess in the objective.
+effortPenalty = 100.
+
+def proper(controllerType,params):
+   # Returns: True if the tuning gives a proper controller with integral action.
+   return bool(Sweep.controllers(controllerType,*[np.array([float(p)]) for p in params])[4][0])
+
+def stable(P,controllerType,params):
+   # Returns: True if the tuning gives a proper controller and an
+   #          asymptotically stable, well-posed loop with the process P.
+   Ac,Bc,Cc,Dc,valid = Sweep.controllers(controllerType,*[np.array([float(p)]) for p in params])
+   if not valid[0]:
+      return False
+   A,B,C,D,posed = Sweep.closedLoops(P,Ac,Bc,Cc,Dc,0)
+   return bool(posed[0]) and np.max(np.linalg.eigvals(A[0]).real) < 0
+
+def evaluate(problem,P,params):
+   # Simulates one tuning. problem is the tuple of tune() arguments that define
+   # the experiment, see there. P is the process model, or None if padeOrder is
+   # 'auto': the order then depends on the closed loop of every tuning (see
+   # Simulation.autoPadeOrder) and is picked once, so the stability check and
+   # the simulation use the same one.
+   # Returns: dictionary with the IAE, ISE, ITAE and TV values added over the
+   #          experiments of the mode, or None if the tuning is not stable.
+   key = (problem,tuple(float(p) for p in params))
+   metrics = evaluations.get(key)
+   if metrics is not None:
+      return metrics or None
+   numP,denP,L,padeOrder,controllerType,mode,magnitude,timeIn,simTime,points,metricsMode = problem
+   metrics = {}
+   if P is None and proper(controllerType,params):
+      numC,denC = sim.controllerPolynomials(controllerType,*params)
+      padeOrder = sim.padeDegree(numP,denP,L,padeOrder,numC,denC)
+      P = sim.process(numP,denP,L,padeOrder)
+   if P is not None and stable(P,controllerType,params):
+      numC,denC = sim.controllerPolynomials(controllerType,*params)
+      results = sim.simulate(numP,denP,L,padeOrder,mode,'step',magnitude,timeIn,simTime,numC,denC,
+                             points=points,engine='discrete',metrics=metricsMode)
+      for FT in ('MYR','MYD'):
+         if FT in results['indexes']:
+            for name in ('IAE','ISE','ITAE','TV'):
+               metrics[name] = metrics.get(name,0.) + float(results['indexes'][FT][name])
+   evaluations.put(key,metrics)  # An empty dictionary marks an unstable tuning.
+   return metrics or None
+
+def tune(numP,denP,L,padeOrder,controllerType,start,bounds,simTime,index='IAE',mode='servo',maxTV=None,
+         magnitude=1.,timeIn=0.,points=5001,metrics='simulated',resolution=None,maxEvaluations=300):
+   # Minimizes index ('IAE', 'ISE' or 'ITAE') of the step response in mode
+   # ('servo', 'reg' or 'both', where the indexes of both experiments are
+   # added) over the (kp,ki,kd,alpha) tuning, see Simulation.controllerCoefficients.
+   # start is the initial tuning and bounds one (low,high) pair per parameter.
+   # If maxTV is given, tunings whose TVu exceeds it are penalized. resolution,
+   # one step per parameter, rounds the evaluated tunings to a grid. metrics is
+   # passed to Simulation.simulate ('analytic' computes the ISE exactly).
+   # Returns: dictionary with the optimal 'params', the objective 'value', its
+   #          'indexes', the number of 'evaluations' done and whether the TVu
+   #          limit is met ('feasible').
+   if mode not in ('servo','reg','both'):
+      raise ValueError('Auto-tuning needs a closed loop mode: {}'.format(mode))
+   if index not in ('IAE','ISE','ITAE'):
+      raise ValueError('Unknown performance index: {}'.format(index))
+   problem = (tuple(float(x) for x in numP),tuple(float(x) for x in denP),float(L),
+              padeOrder if padeOrder == 'auto' else int(padeOrder),controllerType,
+              mode,float(magnitude),float(timeIn),float(simTime),int(points),metrics)
+   P = None if padeOrder == 'auto' else sim.process(numP,denP,L,padeOrder)
+   lower = np.array([b[0] for b in bounds],dtype=float)
+   upper = np.array([b[1] for b in bounds],dtype=float)
+   step = None if resolution is None else np.array(resolution,dtype=float)
+   count = [0]
+
+   def snap(x):
+      x = np.clip(x,lower,upper)
+      if step is not None:
+         x = np.clip(np.round(np.round(x/step)*step,12),lower,upper)
+      return x
+
+   def objective(x):
+      count[0] += 1
+      indexes = evaluate(problem,P,snap(x))
+      if indexes is None:
+         return unstablePenalty
+      value = indexes[index]
+      if maxTV is not None and indexes['TV'] > maxTV:
+         value *= 1+effortPenalty*(indexes['TV']/maxTV-1)**2
+      return value
+
+   # Initial simplex: every parameter moved by a fifth of its value, but at
+   # least a few grid steps, towards the inside of its bounds.
+   x0 = snap(np.array(start,dtype=float))
+   delta = np.maximum(0.2*np.abs(x0),0.05*(upper-lower))
+   if step is not None:
+      delta = np.maximum(delta,3*step)
+   simplex = [x0]
+   for i in range(len(x0)):
+      x = x0.copy()
+      x[i] = x0[i]+delta[i] if x0[i]+delta[i] <= upper[i] else x0[i]-delta[i]
+      simplex.append(snap(x))
+   xatol = float(np.min(step)) if step is not None else 1e-4
+   result = minimize(objective,x0,method='Nelder-Mead',bounds=list(zip(lower,upper)),
+                     options={'initial_simplex': np.array(simplex),'maxfev': maxEvaluations,'xatol': xatol,'fatol': 1e-9})
+   best = snap(result.x)
+   indexes = evaluate(problem,P,best)
+   value = objective(best)
+   if objective(x0) < value:  # The search never returns a worse tuning than the start.
+      best,indexes,value = x0,evaluate(problem,P,x0),objective(x0)
+   return {'params': tuple(float(p) for p in best),'value': value if indexes is not None else None,'indexes': indexes,
+           'evaluations': count[0],'feasible': indexes is not None and (maxTV is None or indexes['TV'] <= maxTV)}
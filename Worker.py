@@ -0,0 +1,49 @@
+###########################################################
+#######           CONTROL SYSTEMS SIMULATOR         #######
+#######              SIMULATION WORKER              #######
+###########################################################
+
+# Background worker that runs simulations off the GUI thread. Only the latest
+# submitted job matters: submitting a new one cancels the previous job if it has
+# not started yet, and a job that was already running is superseded, so its
+# result is reported as stale and must be discarded by the caller.
+
+# Libraries.
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+class SimulationWorker:
+   # Single background thread running the most recent simulation request.
+
+   def __init__(self,name='simulation'):
+      self.executor = ThreadPoolExecutor(max_workers=1,thread_name_prefix=name)
+      self.lock = threading.Lock()
+      self.future = None
+
+   def submit(self,fn,*args,**kwargs):
+      # Queues fn(*args,**kwargs), cancelling the pending job if any.
+      # Returns: the future of the new job.
+      with self.lock:
+         if self.future is not None:
+            self.future.cancel()  # No effect if it is already running.
+         self.future = self.executor.submit(fn,*args,**kwargs)
+         return self.future
+
+   def isCurrent(self,future):
+      # Returns: True if future belongs to the latest submitted job.
+      with self.lock:
+         return future is self.future
+
+   def cancel(self):
+      # Cancels the pending job; a running job is superseded, so its result
+      # is reported as stale.
+      with self.lock:
+         if self.future is not None:
+            self.future.cancel()
+         self.future = None
+
+   def shutdown(self):
+      with self.lock:
+         if self.future is not None:
+            self.future.cancel()
+      self.executor.shutdown(wait=False)
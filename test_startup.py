@@ -0,0 +1,35 @@
+###########################################################
+#######           CONTROL SYSTEMS SIMULATOR         #######
+#######              STARTUP TESTS                  #######
+###########################################################
+
+# Startup budget of the GUI: the code Interface.py runs before creating its
+# window (see Benchmark.startupCode and Lazy.py) must finish within
+# Benchmark.startupBudget seconds and load none of control, scipy,
+# matplotlib or the simulation modules. It runs in new interpreters, so the
+# modules of this process don't count.
+#
+#    python -m pytest test_startup.py
+
+# Libraries.
+import Benchmark
+
+def testStartupSkipsHeavyModules():
+   seconds,heavy = Benchmark.startupImports()
+   assert heavy == []
+
+def testStartupWithinBudget():
+   # Best of three, so the first compilation of the modules is not counted.
+   seconds = min(Benchmark.startupImports()[0] for i in range(3))
+   assert seconds <= Benchmark.startupBudget
+
+def testStartupCodeFollowsInterface(tmp_path):
+   # A heavy import added before the window of Interface.py is detected.
+   with open(Benchmark.interface) as file:
+      source = file.read()
+   path = tmp_path/'Interface.py'
+   path.write_text(source.replace('import Lazy\n','import Lazy\nimport control\n',1))
+   code = Benchmark.startupCode(str(path))
+   assert 'import control' in code and 'mainWindow = tk.Tk()' not in code
+   seconds,heavy = Benchmark.startupImports(str(path))
+   assert 'control' in heavy